@@ -0,0 +1,160 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+Benchmark of the bulk insert paths on Postgres: batched multi-row INSERT
+statements against COPY FROM STDIN, on play_by_play and the
+shot_chart_detail_temp table.
+
+Tables are created in a throwaway `nba_sql_bench` schema, which is dropped
+at the end. Connection settings are read like the main application, from
+the arguments or the DB_* environment variables.
+
+    python scripts/bench/bench_bulk_insert.py --rows 200000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'stats'))
+
+from models import EventMessageType, Game, Player, PlayByPlay, ShotChartDetailTemp, Team  # noqa: E402
+from bulk_load import copy_rows  # noqa: E402
+from settings import Settings  # noqa: E402
+from utils import chunk_list  # noqa: E402
+
+schema = 'nba_sql_bench'
+
+
+def play_by_play_rows(n):
+    """
+    Rows shaped like the ones built by PlayByPlayRequester.fetch_game.
+    """
+    return [
+        {
+            'game_id': 1,
+            'event_num': i,
+            'event_msg_type': 1,
+            'event_msg_action_type': i % 100,
+            'period': i % 4 + 1,
+            'wc_time': '7:42 PM',
+            'home_description': f"Jump Shot {i}",
+            'neutral_description': None,
+            'visitor_description': 'MISS 3PT "Pullup"',
+            'score': '10 - 12',
+            'score_margin': '-2',
+            'player1_id': None,
+            'player1_team_id': 1,
+            'player2_id': None,
+            'player2_team_id': None,
+            'player3_id': None,
+            'player3_team_id': None
+        }
+        for i in range(n)
+    ]
+
+
+def shot_chart_rows(n):
+    """
+    Tuples shaped like the ones built by ShotChartDetailRequester, with the
+    matching field names.
+    """
+    fields = [field.name for field in ShotChartDetailTemp._meta.sorted_fields if field.name != 'id']
+    rows = [
+        (1, 2, 1, i, i % 4 + 1, 5, 30, 'Made Shot', 'Jump Shot', '2PT Field Goal',
+         'Mid-Range', 'Center(C)', '16-24 ft.', 18.0, -12.0, 170.0, True, i % 2 == 0, 'ATL', 'BOS')
+        for i in range(n)
+    ]
+    return rows, fields
+
+
+def insert_statements(settings, table, rows, fields=None):
+    """
+    The INSERT path, as used before COPY.
+    """
+    with settings.db.atomic():
+        for chunk in chunk_list(rows, settings.batch_size):
+            table.insert_many(chunk, fields).execute()
+
+
+def timed(label, fn, table, n):
+    """
+    Run one load into an empty table and print the throughput.
+    """
+    table.delete().execute()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {n / elapsed:>12,.0f} rows/s ({elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk insert benchmark')
+    parser.add_argument('--database-name', default=None)
+    parser.add_argument('--username', default=None)
+    parser.add_argument('--password', default=None)
+    parser.add_argument('--database-host', default=None)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    settings = Settings(
+        'postgres',
+        args.database_name,
+        args.username,
+        args.password,
+        args.database_host,
+        args.batch_size,
+        None,
+        True)
+
+    db = settings.db
+    models = [Team, Player, EventMessageType, Game, PlayByPlay, ShotChartDetailTemp]
+    db.bind(models)
+    db.execute_sql(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+    db.execute_sql(f"SET search_path TO {schema}")
+
+    try:
+        db.create_tables(models)
+        Team.insert_many([{'team_id': 1}, {'team_id': 2}]).execute()
+        EventMessageType.insert(id=1, string='FIELD_GOAL_MADE').execute()
+        Game.insert(
+            game_id=1, team_id_home=1, team_id_away=2, team_id_winner=1, team_id_loser=2,
+            season_id=2020, playoff_game=False, date='2021-01-01').execute()
+
+        pbp_rows = play_by_play_rows(args.rows)
+        timed('play_by_play INSERT',
+              lambda: insert_statements(settings, PlayByPlay, pbp_rows), PlayByPlay, args.rows)
+        timed('play_by_play COPY',
+              lambda: copy_rows(settings, PlayByPlay, pbp_rows), PlayByPlay, args.rows)
+
+        shot_rows, shot_fields = shot_chart_rows(args.rows)
+        timed('shot_chart_detail_temp INSERT',
+              lambda: insert_statements(settings, ShotChartDetailTemp, shot_rows, shot_fields),
+              ShotChartDetailTemp, args.rows)
+        timed('shot_chart_detail_temp COPY',
+              lambda: copy_rows(settings, ShotChartDetailTemp, shot_rows, shot_fields),
+              ShotChartDetailTemp, args.rows)
+    finally:
+        db.execute_sql(f"DROP SCHEMA {schema} CASCADE")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+
+Benchmark of the in-memory id sets, for memory, as measured by tracemalloc,
+and lookup time. The games of a load are held one season at a time and the
+player ids are looked up for every play by play row, so those stay Python
+sets and dicts. The team / player / season units of every loaded season are
+held at once, they are compared with the arrays of `id_sets.py`.
+
+Games are built the way the playergamelogs responses add them, once per row
+of the away team, with new strings for every row like a parsed response.
+
+    python scripts/bench/bench_id_sets.py --seasons 1
+    python scripts/bench/bench_id_sets.py --seasons 28
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'stats'))
+
+from game import GameEntry  # noqa: E402
+from id_sets import IdTuples  # noqa: E402
+
+teams = 30
+games_per_season = 1230
+playoff_games_per_season = 85
+players_per_team_game = 13
+players_per_season = 650
+lookups = 1000000
+
+
+def game_rows(args):
+    """
+    GameEntry of every away team row of every game, as fetch_season builds them.
+    """
+    for season_id in range(2023 - args.seasons + 1, 2024):
+        for n in range(games_per_season + playoff_games_per_season):
+            playoff_game = n >= games_per_season
+            game_id = (40000000 if playoff_game else 20000000) + (season_id % 100) * 100000 + n + 1
+            day = 1 + n // 8
+            game_date = f"{season_id + day // 365}-{day % 365 // 31 % 12 + 1:02d}-{day % 31 % 28 + 1:02d}"
+            for _ in range(players_per_team_game):
+                yield GameEntry(
+                    season_id=season_id,
+                    game_id=f"{game_id:010d}",
+                    game_date=f"{game_date}T00:00:00",
+                    matchup_in=f"T{n % teams:02d} @ T{(n + 1) % teams:02d}",
+                    winner=1610612737 + n % teams if n % 2 else "",
+                    loser="" if n % 2 else 1610612737 + n % teams,
+                    playoff_game=playoff_game)
+
+
+def player_ids(args):
+    # Player ids over the years run from 3 digits to 1630000+.
+    return [random.randrange(1, 1700000) for _ in range(args.seasons * players_per_season // 3)]
+
+
+def team_player_seasons(args, ids):
+    return [
+        (1610612737 + i % teams, ids[i % len(ids)], 2023 - season)
+        for season in range(args.seasons) for i in range(players_per_season)
+    ]
+
+
+def measure(label, build):
+    """
+    Build a structure and print the memory it holds on to. It is built a
+    second time with tracemalloc on, which slows allocations down.
+    """
+    start = time.perf_counter()
+    value = build()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    traced = build()  # noqa: F841, held until measured
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{label:<40} {size / 1024 / 1024:>8.2f} MB {elapsed:>8.3f}s to build")
+    return value
+
+
+def timed(label, fn, probes):
+    """
+    Print the time per lookup of `fn` over the probes.
+    """
+    start = time.perf_counter()
+    for probe in probes:
+        fn(probe)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed / len(probes) * 1e9:>8.0f} ns per lookup")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='In-memory id set benchmark')
+    parser.add_argument('--seasons', type=int, default=28)
+    args = parser.parse_args()
+    random.seed(0)
+
+    print(f"{args.seasons} seasons, {args.seasons * (games_per_season + playoff_games_per_season):,} games.")
+
+    game_set = measure('games: set of GameEntry', lambda: set(game_rows(args)))
+    game_dates = measure('game dates: dict', lambda: {entry.game_id: entry.game_date for entry in game_set})
+    game_ids = [entry.game_id for entry in game_set]
+    probes = [random.choice(game_ids) for _ in range(lookups // 10)]
+    timed('game date: dict', game_dates.__getitem__, probes)
+
+    ids = player_ids(args)
+    id_set = measure('player ids: set', lambda: set(ids))
+    probes = [random.choice(ids) if i % 2 else random.randrange(1, 1700000) for i in range(lookups)]
+    timed('player id: set', id_set.__contains__, probes)
+
+    # New ints for every row, like rows read from the database.
+    measure('team / player / seasons: set', lambda: set(team_player_seasons(args, ids)))
+    measure('team / player / seasons: IdTuples', lambda: IdTuples(3, team_player_seasons(args, ids), 'i'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+Benchmark of the merges from the staging tables into player_game_log and
+shot_chart_detail against a table holding many seasons of history. Compares
+the NOT IN / EXCEPT queries used before with `db_utils.merge_staged`.
+
+Half of the staged games are already loaded, as on a current season refresh.
+Every merge runs in a transaction that is rolled back, so they all start
+from the same tables. SQLite and DuckDB run in a temp file, Postgres in a
+throwaway `nba_sql_bench` schema, with connection settings read like the main
+application.
+
+    python scripts/bench/bench_staged_merge.py --history-games 20000
+    python scripts/bench/bench_staged_merge.py --database postgres
+    python scripts/bench/bench_staged_merge.py --database duckdb
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'stats'))
+
+from models import (  # noqa: E402
+    Game,
+    Player,
+    PlayerGameLog,
+    PlayerGameLogTemp,
+    Season,
+    ShotChartDetail,
+    ShotChartDetailTemp,
+    Team
+)
+from db_utils import create_tables, insert_many, merge_staged  # noqa: E402
+from settings import Settings  # noqa: E402
+
+schema = 'nba_sql_bench'
+teams = 30
+players = 600
+players_per_game = 20
+shots_per_game = 160
+
+
+def history(args):
+    """
+    Games, player_game_log and shot_chart_detail rows. Games are spread over
+    seasons of 1230 games, like the regular season.
+    """
+    games = []
+    for n in range(args.history_games + args.staged_games):
+        season_id = 1997 + n // 1230
+        game_id = 20000000 + (season_id % 100) * 100000 + n % 1230 + 1
+        games.append((game_id, n % teams + 1, (n + 1) % teams + 1, n % teams + 1, (n + 1) % teams + 1,
+                      season_id, False, '2021-01-01'))
+
+    game_logs = []
+    shots = []
+    for game_id, home, away, _, _, season_id, _, _ in games:
+        for i in range(players_per_game):
+            game_logs.append((i + (game_id % 29) * players_per_game + 1, game_id, home if i % 2 else away, season_id))
+        for i in range(shots_per_game):
+            shots.append((game_id, i % players_per_game + (game_id % 29) * players_per_game + 1,
+                          home if i % 2 else away, i, season_id))
+    return games, game_logs, shots
+
+
+def timed(db, label, fn):
+    """
+    Run one merge in a transaction that is rolled back, and print the time.
+    """
+    with db.atomic() as transaction:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        transaction.rollback()
+    print(f"{label:<45} {elapsed:>8.3f}s")
+
+
+def not_in_game_log():
+    """
+    PlayerGameLogRequester.insert_from_temp_into_reg, before the staged merge.
+    """
+    fields = PlayerGameLog._meta.sorted_fields
+    (PlayerGameLog.insert_from(
+        PlayerGameLogTemp
+        .select(*[getattr(PlayerGameLogTemp, field.name) for field in fields])
+        .where(PlayerGameLogTemp.game_id.not_in(PlayerGameLog.select(PlayerGameLog.game_id))),
+        fields=fields)).execute()
+
+
+def merge_game_log(settings):
+    fields = PlayerGameLog._meta.sorted_fields
+    query = PlayerGameLogTemp.select(*[getattr(PlayerGameLogTemp, field.name) for field in fields])
+    merge_staged(settings, PlayerGameLog, query, fields, key=['player_id', 'game_id'])
+
+
+def except_shot_chart():
+    """
+    ShotChartDetailRequester.finalize in current season mode, before the
+    staged merge.
+    """
+    fields = [field for field in ShotChartDetail._meta.sorted_fields if field.name not in ('id', 'season_id')]
+    expt = (ShotChartDetailTemp.select(ShotChartDetailTemp.game_id)
+            - ShotChartDetail.select(ShotChartDetail.game_id))
+    (ShotChartDetail.insert_from(
+        ShotChartDetailTemp
+        .select(*[getattr(ShotChartDetailTemp, field.name) for field in fields])
+        .where(ShotChartDetailTemp.game_id.in_(expt.select_from(expt.c.game_id))),
+        fields=fields)).execute()
+
+
+def merge_shot_chart(settings):
+    fields = [field for field in ShotChartDetail._meta.sorted_fields if field.name not in ('id', 'season_id')]
+    query = (ShotChartDetailTemp
+             .select(*[getattr(ShotChartDetailTemp, field.name) for field in fields], Game.season_id)
+             .join(Game, on=(ShotChartDetailTemp.game_id == Game.game_id)))
+    merge_staged(settings, ShotChartDetail, query, fields + [ShotChartDetail.season_id],
+                 key=['game_id', 'game_event_id', 'player_id'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Staged merge benchmark')
+    parser.add_argument('--database', dest='database_type', default='sqlite', choices=['sqlite', 'postgres', 'duckdb'])
+    parser.add_argument('--database-name', default=None)
+    parser.add_argument('--username', default=None)
+    parser.add_argument('--password', default=None)
+    parser.add_argument('--database-host', default=None)
+    parser.add_argument('--history-games', type=int, default=10000)
+    parser.add_argument('--staged-games', type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    settings = Settings(
+        args.database_type,
+        args.database_name,
+        args.username,
+        args.password,
+        args.database_host,
+        10000,
+        os.path.join(directory, 'bench.db'),
+        True,
+        duckdb_path=os.path.join(directory, 'bench.duckdb'))
+
+    db = settings.db
+    models = [Team, Player, Season, Game, PlayerGameLog, PlayerGameLogTemp, ShotChartDetail, ShotChartDetailTemp]
+    db.bind(models)
+    if args.database_type == 'postgres':
+        db.execute_sql(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        db.execute_sql(f"SET search_path TO {schema}")
+
+    try:
+        create_tables(settings, [Team, Player, Season, Game, PlayerGameLog, ShotChartDetail])
+        db.create_tables([PlayerGameLogTemp, ShotChartDetailTemp])
+        games, game_logs, shots = history(args)
+        loaded = args.history_games * players_per_game
+        staged_from = (args.history_games - args.staged_games // 2)
+
+        print(f"Loading {args.history_games} games of history.")
+        insert_many(settings, Team, [(i,) for i in range(1, teams + 1)], ['team_id'])
+        insert_many(settings, Player, [(i,) for i in range(1, players + 1)], ['player_id'])
+        insert_many(settings, Season, [(season,) for season in sorted({game[5] for game in games})], ['season_id'])
+        insert_many(settings, Game, games, [field.name for field in Game._meta.sorted_fields])
+
+        game_log_fields = ['player_id', 'game_id', 'team_id', 'season_id']
+        insert_many(settings, PlayerGameLog, game_logs[:loaded], game_log_fields)
+        insert_many(settings, PlayerGameLogTemp, game_logs[staged_from * players_per_game:], game_log_fields)
+
+        shot_fields = ['game_id', 'player_id', 'team_id', 'game_event_id', 'season_id']
+        insert_many(settings, ShotChartDetail, shots[:args.history_games * shots_per_game], shot_fields)
+        insert_many(settings, ShotChartDetailTemp, [shot[:4] for shot in shots[staged_from * shots_per_game:]],
+                    shot_fields[:4])
+
+        print(f"{len(game_logs[:loaded]):,} player_game_log rows, "
+              f"{args.history_games * shots_per_game:,} shot_chart_detail rows, "
+              f"{args.staged_games} staged games.")
+        timed(db, 'player_game_log NOT IN', not_in_game_log)
+        timed(db, 'player_game_log merge_staged', lambda: merge_game_log(settings))
+        timed(db, 'shot_chart_detail EXCEPT + IN', except_shot_chart)
+        timed(db, 'shot_chart_detail merge_staged', lambda: merge_shot_chart(settings))
+    finally:
+        if args.database_type == 'postgres':
+            db.execute_sql(f"DROP SCHEMA {schema} CASCADE")
+        db.close()
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -29,10 +29,11 @@ def create_parser(parser):
         '--database',
         dest='database_type',
         default='sqlite',
-        choices=['mysql', 'postgres', 'sqlite'],
+        choices=['mysql', 'postgres', 'sqlite', 'duckdb'],
         help='''
             The database flag specifies which database protocol to use.
-            Defaults to "sqlite", but also accepts "postgres" and "mysql".
+            Defaults to "sqlite", but also accepts "postgres", "mysql",
+            and "duckdb".
         ''')
 
     parser.add_argument(
@@ -60,13 +61,245 @@ def create_parser(parser):
             If the schema already exists then nothing will happen.
         ''')
 
+    parser.add_argument(
+        '--resume',
+        dest='resume',
+        action='store_true',
+        help='''
+            Resume a default mode load that was interrupted, skipping the
+            seasons, games, and players that were already loaded.
+        ''')
+
+    parser.add_argument(
+        '--reload-seasons',
+        dest='reload_seasons',
+        action='store_true',
+        help='''
+            Load the seasons passed with --seasons again into a database
+            that has them. Their player_game_log, play_by_play,
+            play_by_playv3, and shot_chart_detail rows are replaced, the
+            rest is kept.
+        ''')
+
     parser.add_argument(
         '--time-between-requests',
         dest='request_gap',
         default='.7',
         help='''
-            This flag exists to prevent rate limiting, and injects the
+            This flag exists to prevent rate limiting, and sets the
             desired amount of time inbetween requesting resources.
+            Ignored if --requests-per-second is set.
+        ''')
+
+    parser.add_argument(
+        '--requests-per-second',
+        dest='requests_per_second',
+        default=None,
+        type=float,
+        help='''
+            Request budget for the NBA API, shared by every table. Defaults
+            to one request per --time-between-requests.
+        ''')
+
+    parser.add_argument(
+        '--request-burst',
+        dest='request_burst',
+        default=1,
+        type=int,
+        help='''
+            Number of requests that can go out back to back before the
+            --requests-per-second limit kicks in.
+        ''')
+
+    parser.add_argument(
+        '--adaptive-rate',
+        dest='adaptive_rate',
+        action='store_true',
+        help='''
+            Adjust the request budget while loading. The rate starts at
+            --requests-per-second (or --time-between-requests), climbs while
+            responses are healthy, and is halved when the API throttles us.
+        ''')
+
+    parser.add_argument(
+        '--max-requests-per-second',
+        dest='max_requests_per_second',
+        default=10.0,
+        type=float,
+        help='Upper bound on the request rate when using --adaptive-rate.')
+
+    parser.add_argument(
+        '--request-timeout',
+        dest='request_timeout',
+        default=30,
+        type=float,
+        help='Seconds to wait on a response from the NBA API before retrying.')
+
+    parser.add_argument(
+        '--request-retries',
+        dest='request_retries',
+        default=3,
+        type=int,
+        help='''
+            Number of times to retry a request that was throttled, timed
+            out, or failed on the server side.
+        ''')
+
+    parser.add_argument(
+        '--max-in-flight',
+        dest='max_in_flight',
+        default=4,
+        type=int,
+        help='''
+            Number of concurrent requests when loading play_by_play and
+            play_by_playv3, still bound by the request budget.
+        ''')
+
+    parser.add_argument(
+        '--http-pool-size',
+        dest='http_pool_size',
+        default=10,
+        type=int,
+        help='''
+            Number of keep-alive HTTP connections held open per host.
+            Connections are reused across every request in a run.
+        ''')
+
+    parser.add_argument(
+        '--shard-by',
+        dest='shard_by',
+        default=None,
+        choices=['month', 'week'],
+        help='''
+            Request player_game_log a month or a week at a time instead of a
+            whole season per request. Shards are fetched --max-in-flight at a
+            time, and a malformed shard is retried on its own.
+        ''')
+
+    parser.add_argument(
+        '--parallel-stages',
+        dest='parallel_stages',
+        default=1,
+        type=int,
+        help='''
+            Number of tables to load at once in the default mode. Tables
+            only start once the tables they depend on are loaded, and all of
+            them share the same request budget.
+        ''')
+
+    parser.add_argument(
+        '--verify-schema',
+        dest='verify_schema',
+        action='store_true',
+        default=False,
+        help='''
+            Check every table against its model once, before loading it.
+            Useful on databases created by an older version of nba-sql.
+        ''')
+
+    parser.add_argument(
+        '--queue-depth',
+        dest='queue_depth',
+        default=2,
+        type=int,
+        help='''
+            Number of fetched play by play batches that can wait to be written
+            to the database. When the database falls behind, fetching pauses
+            until there is room, which keeps memory use flat.
+        ''')
+
+    parser.add_argument(
+        '--writers',
+        dest='writers',
+        default=1,
+        type=int,
+        help='''
+            Number of threads writing play by play batches to the database at
+            once. Postgres and MySQL only, SQLite and DuckDB always use one.
+        ''')
+
+    parser.add_argument(
+        '--response-cache',
+        dest='response_cache',
+        default=None,
+        help='''
+            Directory to cache NBA API responses in. Responses for past
+            seasons are kept until evicted, so rebuilding a database does
+            not download them again.
+        ''')
+
+    parser.add_argument(
+        '--cache-ttl-hours',
+        dest='cache_ttl_hours',
+        default=24,
+        type=float,
+        help='''
+            Hours until a cached response for the current season expires.
+            --current-season-mode never reads them.
+        ''')
+
+    parser.add_argument(
+        '--cache-max-mb',
+        dest='cache_max_mb',
+        default=4096,
+        type=int,
+        help='''
+            Size limit of the response cache. The least recently used
+            responses are removed at the end of a run to stay under it.
+        ''')
+
+    parser.add_argument(
+        '--offline-replay',
+        dest='offline_replay',
+        action='store_true',
+        help='''
+            Build the database only from the --response-cache directory,
+            without making any requests to the NBA API.
+        ''')
+
+    parser.add_argument(
+        '--daemon',
+        dest='daemon',
+        action='store_true',
+        help='''
+            With --current-season-mode, keep running and refresh the current
+            season on a schedule, reusing connections between refreshes.
+        ''')
+
+    parser.add_argument(
+        '--poll-minutes',
+        dest='poll_minutes',
+        default=60,
+        type=float,
+        help='Minutes between refreshes in --daemon mode.')
+
+    parser.add_argument(
+        '--game-night-poll-minutes',
+        dest='game_night_poll_minutes',
+        default=10,
+        type=float,
+        help='''
+            Minutes between refreshes in --daemon mode while games are
+            played, from 6pm to 2am local time.
+        ''')
+
+    parser.add_argument(
+        '--status-file',
+        dest='status_file',
+        default=None,
+        help='''
+            JSON file the --daemon writes its state to, with the duration and
+            counts of the last refresh and the last error.
+        ''')
+
+    parser.add_argument(
+        '--parquet-dir',
+        dest='parquet_dir',
+        default=None,
+        help='''
+            Export the tables to Parquet datasets in this directory after
+            loading, partitioned by season. Only the loaded seasons (or the
+            current season) are rewritten.
         ''')
 
     # To fix issue https://github.com/mpope9/nba-sql/issues/56
@@ -79,12 +312,51 @@ def create_parser(parser):
             This value is ignored when selecting database 'sqlite'.
         ''')
 
+    parser.add_argument(
+        '--defer-indexes',
+        dest='defer_indexes',
+        action='store_true',
+        default=False,
+        help='''
+            With --create-schema, create the tables without their indexes (and
+            foreign keys on Postgres and MySQL) and build them once the load
+            is done. Faster for a fresh database.
+        ''')
+
+    parser.add_argument(
+        '--partition-seasons',
+        dest='partition_seasons',
+        action='store_true',
+        default=False,
+        help='''
+            With --create-schema on Postgres, create player_game_log,
+            play_by_play, play_by_playv3, and shot_chart_detail partitioned
+            by season, with a partition for each loaded season.
+        ''')
+
+    parser.add_argument(
+        '--sqlite-bulk-load',
+        dest='sqlite_bulk_load',
+        action='store_true',
+        default=False,
+        help='''
+            Load a SQLite database with pragmas tuned for bulk loading. Safe
+            settings are restored once the load is done. If the machine
+            crashes during the load, rerun it with --resume.
+        ''')
+
     parser.add_argument(
         '--sqlite-path',
         dest='sqlite_path',
         default='nba_sql.db',
         help='Setting to define sqlite path.')
 
+    parser.add_argument(
+        '--duckdb-path',
+        dest='duckdb_path',
+        default='nba_sql.duckdb',
+        help='Setting to define duckdb path.')
+
     parser.add_argument(
         '--quiet',
         dest='quiet',
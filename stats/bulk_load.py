@@ -0,0 +1,359 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+Bulk loading paths that skip INSERT statements.
+
+On Postgres rows are streamed in with COPY FROM STDIN. They are encoded as
+CSV while psycopg2 reads from the stream, so nothing is written to disk and a
+batch is never held in memory as one big statement.
+
+On MySQL / MariaDB rows are streamed in with LOAD DATA LOCAL INFILE. PyMySQL
+only reads local files by name, so rows are written to a pipe from another
+thread and the driver reads them from its /dev/fd path. Where that doesn't
+exist, a temp file is used instead.
+
+On DuckDB rows are turned into an Arrow table, column by column, and inserted
+with a single INSERT ... SELECT from it. DuckDB and pyarrow are optional
+packages, only needed for a DuckDB database.
+"""
+
+import os
+import tempfile
+import threading
+from operator import itemgetter
+
+from peewee import DatabaseError
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# NULL marker for both formats. Postgres strings are always quoted, so a
+# quoted "\N" stays a string. MySQL strings have their backslashes escaped.
+null_marker = '\\N'
+
+# Errors MySQL / MariaDB return when LOAD DATA LOCAL is turned off on the
+# server or the client.
+local_infile_disabled_errors = {1148, 2068, 3948}
+
+# Bytes written to the pipe at once.
+write_size = 64 * 1024
+
+
+class CopyStream:
+    """
+    File-like object that psycopg2's `copy_expert` reads CSV text from.
+    """
+
+    def __init__(self, rows, converters, row_fn=None):
+        """
+        Constructor. `converters` are the `db_value` functions of the
+        columns, `row_fn` turns a row into a tuple in column order.
+        """
+        self.rows = iter(rows)
+        self.converters = converters
+        self.row_fn = row_fn
+        self.pending = ''
+
+    def read(self, size=-1):
+        """
+        Returns up to `size` characters, or everything that is left.
+        """
+        chunks = [self.pending]
+        length = len(self.pending)
+
+        while size < 0 or length < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            line = self.encode_row(row)
+            chunks.append(line)
+            length += len(line)
+
+        data = ''.join(chunks)
+        if size < 0:
+            self.pending = ''
+            return data
+
+        self.pending = data[size:]
+        return data[:size]
+
+    def encode_row(self, row):
+        """
+        One CSV line.
+        """
+        if self.row_fn is not None:
+            row = self.row_fn(row)
+        return ','.join(
+            encode_value(converter(value))
+            for converter, value in zip(self.converters, row)
+        ) + '\n'
+
+
+def encode_value(value):
+    """
+    CSV encoding of a single value, as Postgres reads it.
+    """
+    if value is None:
+        return null_marker
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value)
+
+
+def encode_mysql_value(value):
+    """
+    Tab separated encoding of a single value, as LOAD DATA reads it with
+    the default escape character.
+    """
+    if value is None:
+        return null_marker
+    if isinstance(value, str):
+        return (value
+                .replace('\\', '\\\\')
+                .replace('\t', '\\t')
+                .replace('\n', '\\n')
+                .replace('\r', '\\r')
+                .replace('\0', '\\0'))
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return str(value)
+
+
+def prepare_rows(table, rows, fields):
+    """
+    Returns the fields being loaded and a function turning a row into a
+    tuple in their order, or None if the rows already are. Fields with a
+    default that aren't passed are added, like peewee's insert_many does.
+    """
+    if fields is None:
+        fields = list(rows[0].keys())
+        if len(fields) == 1:
+            key = fields[0]
+
+            def row_fn(row):
+                return (row[key],)
+        else:
+            row_fn = itemgetter(*fields)
+    else:
+        row_fn = None
+
+    fields = [getattr(table, field) if isinstance(field, str) else field for field in fields]
+
+    # Fields overload ==, compare them by name.
+    names = {field.name for field in fields}
+    defaults = [(field, default) for field, default in table._meta.defaults.items() if field.name not in names]
+    if not defaults:
+        return fields, row_fn
+
+    def with_defaults(row):
+        if row_fn is not None:
+            row = row_fn(row)
+        return tuple(row) + tuple(default() if callable(default) else default for _, default in defaults)
+
+    return fields + [field for field, _ in defaults], with_defaults
+
+
+def copy_rows(settings, table, rows, fields=None):
+    """
+    COPY the rows into the model's table. Rows are either dicts with the
+    same keys, or tuples in the order of `fields`.
+    """
+    if not rows:
+        return
+
+    fields, row_fn = prepare_rows(table, rows, fields)
+    columns = ', '.join(f'"{field.column_name}"' for field in fields)
+
+    table_name = f'"{table._meta.table_name}"'
+    if table._meta.schema:
+        table_name = f'"{table._meta.schema}".{table_name}'
+
+    sql = f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{null_marker}')"
+    stream = CopyStream(rows, [field.db_value for field in fields], row_fn)
+
+    with settings.db.atomic():
+        cursor = settings.db.cursor()
+        cursor.copy_expert(sql, stream)
+
+
+def mysql_lines(rows, converters, row_fn):
+    """
+    Yields the rows as chunks of tab separated lines, encoded as UTF-8.
+    """
+    lines = []
+    length = 0
+    for row in rows:
+        if row_fn is not None:
+            row = row_fn(row)
+        line = '\t'.join(
+            encode_mysql_value(converter(value))
+            for converter, value in zip(converters, row)
+        ) + '\n'
+        lines.append(line)
+        length += len(line)
+        if length >= write_size:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+            length = 0
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+
+def load_data_rows(settings, table, rows, fields=None):
+    """
+    LOAD DATA LOCAL INFILE the rows into the model's table. Rows are either
+    dicts with the same keys, or tuples in the order of `fields`.
+
+    Returns False without loading anything if the server or driver doesn't
+    allow LOAD DATA LOCAL, so the caller can fall back to INSERT.
+
+    Note that with LOCAL, MySQL skips rows with a duplicate key instead of
+    failing, as if IGNORE was passed.
+    """
+    if not rows:
+        return True
+
+    fields, row_fn = prepare_rows(table, rows, fields)
+    columns = ', '.join(f'`{field.column_name}`' for field in fields)
+    chunks = mysql_lines(rows, [field.db_value for field in fields], row_fn)
+
+    def sql(path):
+        return (
+            f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE `{table._meta.table_name}` "
+            "CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+            f"LINES TERMINATED BY '\\n' ({columns})"
+        )
+
+    try:
+        with settings.db.atomic():
+            if os.path.isdir('/dev/fd'):
+                load_from_pipe(settings, chunks, sql)
+            else:
+                load_from_temp_file(settings, chunks, sql)
+    except DatabaseError as e:
+        if e.args and e.args[0] in local_infile_disabled_errors:
+            return False
+        raise
+
+    return True
+
+
+def load_from_pipe(settings, chunks, sql):
+    """
+    Write the chunks to a pipe from a thread while the driver reads the
+    other end through /dev/fd.
+    """
+    read_fd, write_fd = os.pipe()
+    errors = []
+
+    def write():
+        try:
+            with os.fdopen(write_fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        except BrokenPipeError:
+            # The server refused the load before reading anything.
+            pass
+        except BaseException as e:
+            errors.append(e)
+
+    writer = threading.Thread(target=write, daemon=True)
+    writer.start()
+
+    try:
+        settings.db.execute_sql(sql(f"/dev/fd/{read_fd}"))
+    finally:
+        # Unblocks the writer if the driver never opened the pipe.
+        os.close(read_fd)
+        writer.join()
+
+    if errors:
+        raise errors[0]
+
+
+def load_from_temp_file(settings, chunks, sql):
+    """
+    Fallback for platforms without /dev/fd.
+    """
+    fd, path = tempfile.mkstemp(suffix='.tsv')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        # MySQL wants forward slashes, even on Windows.
+        settings.db.execute_sql(sql(path.replace('\\', '/')))
+    finally:
+        os.remove(path)
+
+
+def arrow_rows(settings, table, rows, fields=None, ignore=False):
+    """
+    Insert the rows into the model's table through an Arrow table. Rows are
+    either dicts with the same keys, or tuples in the order of `fields`.
+
+    With `ignore`, rows whose key is already in the table are skipped. DuckDB
+    fails on duplicate keys within one statement even then, so only the first
+    row of each key is inserted.
+    """
+    if not rows:
+        return
+
+    fields, row_fn = prepare_rows(table, rows, fields)
+    if row_fn is not None:
+        rows = [row_fn(row) for row in rows]
+
+    arrow_table = pyarrow.table({
+        field.column_name: arrow_column([field.db_value(row[i]) for row in rows])
+        for i, field in enumerate(fields)
+    })
+
+    columns = ', '.join(f'"{field.column_name}"' for field in fields)
+    select = f'SELECT {columns} FROM nba_sql_arrow'
+    verb = 'INSERT'
+    if ignore:
+        verb = 'INSERT OR IGNORE'
+        names = {field.name for field in fields}
+        keys = [field for field in table._meta.get_primary_keys() if field.name in names]
+        if keys:
+            key_columns = ', '.join(f'"{field.column_name}"' for field in keys)
+            select = f'SELECT DISTINCT ON ({key_columns}) {columns} FROM nba_sql_arrow'
+
+    # The view name is local to the connection, so threads don't collide.
+    connection = settings.db.connection()
+    connection.register('nba_sql_arrow', arrow_table)
+    try:
+        with settings.db.atomic():
+            settings.db.execute_sql(f'{verb} INTO "{table._meta.table_name}" ({columns}) {select}')
+    finally:
+        connection.unregister('nba_sql_arrow')
+
+
+def arrow_column(values):
+    """
+    Arrow array of a column. A column mixing types, like numbers sent as
+    strings, is passed as strings and cast by DuckDB on insert.
+    """
+    try:
+        return pyarrow.array(values)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        return pyarrow.array([None if value is None else str(value) for value in values], pyarrow.string())
@@ -0,0 +1,159 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+Refresh daemon. Keeps the settings, connections, and requesters of the
+current season mode alive between refreshes, instead of paying for a new
+process every time, and refreshes on a schedule.
+"""
+
+from datetime import datetime, timedelta
+
+import json
+import os
+import signal
+import threading
+import time
+import traceback
+
+# Local hours when games are played. The database is polled more often then.
+game_night_start_hour = 18
+game_night_end_hour = 2
+
+
+class PollSchedule:
+    """
+    Time between refreshes, shorter on game nights.
+    """
+
+    def __init__(self, poll_minutes=60, game_night_poll_minutes=10):
+        self.poll = timedelta(minutes=poll_minutes)
+        self.game_night_poll = timedelta(minutes=game_night_poll_minutes)
+
+    def is_game_night(self, now):
+        """
+        Whether games may be going on at `now`, local time.
+        """
+        return now.hour >= game_night_start_hour or now.hour < game_night_end_hour
+
+    def interval(self, now):
+        """
+        Time to wait after a refresh that finished at `now`.
+        """
+        if self.is_game_night(now):
+            return self.game_night_poll
+        return self.poll
+
+
+class StatusFile:
+    """
+    JSON file with the state of the daemon and its last refresh, for
+    monitoring. Replaced as a whole so readers never see a partial file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.status = {
+            'pid': os.getpid(),
+            'started_at': datetime.now(),
+            'state': 'starting',
+            'refreshes': 0,
+            'failures': 0,
+            'last_refresh': None,
+            'last_error': None,
+            'next_refresh_at': None
+        }
+
+    def update(self, **values):
+        """
+        Update the status and write it out.
+        """
+        self.status.update(values)
+        if self.path is None:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.status, f, indent=2, default=str)
+        os.replace(tmp_path, self.path)
+
+
+class RefreshDaemon:
+    """
+    Calls `refresh` on the schedule until stopped. `refresh` returns a dict of
+    counts, stored in the status file. A failed refresh is logged and retried
+    at the next poll. SIGTERM stops the daemon once the current refresh is done.
+    """
+
+    def __init__(self, refresh, schedule, status_file, quiet=False):
+        self.refresh = refresh
+        self.schedule = schedule
+        self.status_file = status_file
+        self.quiet = quiet
+        self.stopping = threading.Event()
+
+    def stop(self, *args):
+        """
+        Stop after the current refresh. Also the SIGTERM handler.
+        """
+        self.stopping.set()
+
+    def run(self):
+        """
+        Refresh until stopped. Blocks, call from the main thread.
+        """
+        signal.signal(signal.SIGTERM, self.stop)
+        try:
+            while not self.stopping.is_set():
+                self.refresh_once()
+
+                now = datetime.now()
+                interval = self.schedule.interval(now)
+                self.status_file.update(state='waiting', next_refresh_at=now + interval)
+                if not self.quiet:
+                    print(f"Next refresh at {now + interval:%Y-%m-%d %H:%M:%S}.")
+                self.stopping.wait(interval.total_seconds())
+        except KeyboardInterrupt:
+            pass
+        self.status_file.update(state='stopped', next_refresh_at=None)
+
+    def refresh_once(self):
+        """
+        Run one refresh and record how it went.
+        """
+        started_at = datetime.now()
+        started = time.monotonic()
+        self.status_file.update(state='refreshing')
+
+        try:
+            counts = self.refresh()
+        except Exception as e:
+            traceback.print_exc()
+            self.status_file.update(
+                failures=self.status_file.status['failures'] + 1,
+                last_error={
+                    'started_at': started_at,
+                    'seconds': round(time.monotonic() - started, 3),
+                    'error': repr(e)
+                })
+            return
+
+        self.status_file.update(
+            refreshes=self.status_file.status['refreshes'] + 1,
+            last_refresh={
+                'started_at': started_at,
+                'seconds': round(time.monotonic() - started, 3),
+                'counts': counts
+            })
@@ -19,52 +19,277 @@ limitations under the License.
 Database utilities (future middleware layer if we decide to use DuckDB by default.)
 """
 
-from utils import chunk_list
+from functools import reduce
+import operator
 
+from peewee import SQL, DatabaseError, Entity, Expression, ForeignKeyField, NodeList, fn, sort_models
 
-def insert_many(settings, table, rows):
+from models import Game
+from utils import chunk_list, progress_bar
+from bulk_load import arrow_rows, copy_rows, load_data_rows
+from partitions import partitioned_table
+import sqlite_bulk
+
+
+def insert_many(settings, table, rows, fields=None):
     """
     Entry function on insert_many.
+
+    Rows are either dicts, or tuples in the order of the passed `fields`.
+    On Postgres rows are streamed in with COPY instead, and on MySQL with
+    LOAD DATA LOCAL INFILE, unless the server has it turned off. On DuckDB
+    they are inserted from an Arrow table.
     """
 
+    if settings.db_type == 'postgres':
+        copy_rows(settings, table, rows, fields)
+        return
+
+    if settings.db_type == 'duckdb':
+        arrow_rows(settings, table, rows, fields)
+        return
+
+    if settings.db_type == 'mysql' and settings.load_data_local:
+        if load_data_rows(settings, table, rows, fields):
+            return
+        print("LOAD DATA LOCAL INFILE is disabled on the server, falling back to INSERT statements.")
+        settings.load_data_local = False
+
     chunked_rows = chunk_list(rows, settings.batch_size)
     if settings.db_type == 'sqlite':
-        __insert_many_sqlite(settings, table, rows)
+        __insert_many_sqlite(settings, table, rows, fields)
     else:
         with settings.db.atomic():
             for row in chunked_rows:
-                table.insert_many(row).execute()
+                table.insert_many(row, fields).execute()
 
 
-def __insert_many_sqlite(settings, table, rows):
+def __insert_many_sqlite(settings, table, rows, fields):
     """
-    SQLite has a limit on number of rows. Chunk the rows and batch insert.
+    SQLite has a limit on number of bound variables. Chunk the rows to fit and
+    batch insert.
     """
 
-    chunked_rows = chunk_list(rows, 500)
+    if not rows:
+        return
+    if settings.sqlite_executemany:
+        sqlite_bulk.executemany_rows(settings, table, rows, fields)
+        return
+
+    chunked_rows = chunk_list(rows, sqlite_bulk.chunk_size(settings, table, rows, fields))
     with settings.db.atomic():
         for row in chunked_rows:
-            table.insert_many(row).execute()
+            table.insert_many(row, fields).execute()
 
 
-def insert_many_on_conflict_ignore(settings, table, rows):
+def insert_many_on_conflict_ignore(settings, table, rows, fields=None):
     """
     Entry function on insert_many, ignoring conflicts on key issues.
+
+    Rows are either dicts, or tuples in the order of the passed `fields`.
     """
 
-    if settings.db_type == 'sqlite':
-        __insert_many_on_conflict_ignore_sqlite(settings, table, rows)
+    if settings.db_type == 'duckdb':
+        arrow_rows(settings, table, rows, fields, ignore=True)
+    elif settings.db_type == 'sqlite':
+        __insert_many_on_conflict_ignore_sqlite(settings, table, rows, fields)
     else:
         with settings.db.atomic():
-            table.insert_many(rows).on_conflict_ignore().execute()
+            table.insert_many(rows, fields).on_conflict_ignore().execute()
 
 
-def __insert_many_on_conflict_ignore_sqlite(settings, table, rows):
+def __insert_many_on_conflict_ignore_sqlite(settings, table, rows, fields):
     """
-    SQLite has a limit on number of rows. Chunk the rows and batch insert.
+    SQLite has a limit on number of bound variables. Chunk the rows to fit and
+    batch insert.
     """
 
-    chunked_rows = chunk_list(rows, 500)
+    if not rows:
+        return
+    if settings.sqlite_executemany:
+        sqlite_bulk.executemany_rows(settings, table, rows, fields, ignore=True)
+        return
+
+    chunked_rows = chunk_list(rows, sqlite_bulk.chunk_size(settings, table, rows, fields))
     with settings.db.atomic():
         for row in chunked_rows:
-            table.insert_many(row).on_conflict_ignore().execute()
+            table.insert_many(row, fields).on_conflict_ignore().execute()
+
+
+def merge_staged(settings, table, query, fields, key):
+    """
+    Staged merge. Inserts the rows selected by `query`, a select on a staging
+    table, into `table`, except the rows whose `key` is already there.
+    `fields` are the fields of `table` the selected columns go to, and `key`
+    names fields both tables have.
+
+    Rows already loaded are found with a NOT EXISTS anti-join, which looks
+    each key up in the table's index on it. NOT IN needs the whole subquery,
+    and matches nothing once it holds a NULL. Key fields that can be NULL
+    match when both sides are NULL, as they did with EXCEPT. Where `key` is
+    also one of the table's unique constraints, as player_game_log's primary
+    key, rows breaking it are ignored as well, in each database's own syntax.
+    """
+
+    staging = query.model
+    existing = table.alias('existing')
+    match = reduce(operator.and_, [
+        key_match(settings, table, name, getattr(existing, name), getattr(staging, name))
+        for name in key
+    ])
+    query = query.where(~fn.EXISTS(existing.select(SQL('1')).where(match)))
+
+    # Without returning(), Postgres sends back the key of every new row.
+    with settings.db.atomic():
+        table.insert_from(query, fields).on_conflict_ignore().returning().execute()
+
+
+# Equality that also holds for two NULLs, and is still looked up in an index.
+null_safe_equals = {'sqlite': 'IS', 'mysql': '<=>'}
+
+
+def key_match(settings, table, name, existing, staged):
+    """
+    Condition for a key field of `merge_staged`. `=` is never true for NULLs,
+    so a field that can be NULL is compared with the database's null-safe
+    equality instead. Primary key fields never are NULL.
+    """
+    primary_key = [field.name for field in table._meta.get_primary_keys()]
+    if not table._meta.fields[name].null or name in primary_key:
+        return existing == staged
+    return Expression(existing, null_safe_equals.get(settings.db_type, 'IS NOT DISTINCT FROM'), staged)
+
+
+def create_tables(settings, models):
+    """
+    Entry function on creating tables.
+
+    With `settings.defer_indexes`, tables are created bare. Secondary
+    indexes, and foreign keys on Postgres / MySQL, are left to
+    `build_indexes`, so bulk loads don't maintain them row by row. Unique
+    indexes are still created up front, inserts rely on them.
+
+    DuckDB tables are always created without foreign keys. DuckDB can't add
+    them later, and it checks them row by row on every insert.
+
+    With `settings.partition_seasons`, the large tables are partitioned by
+    season on Postgres, see partitions.py.
+    """
+
+    settings.created_models.update(models)
+
+    leave_out_foreign_keys = settings.defer_indexes or settings.db_type == 'duckdb'
+    if not leave_out_foreign_keys and not settings.partition_seasons:
+        settings.db.create_tables(models, safe=True)
+        return
+
+    for model in sort_models(models):
+        foreign_keys = []
+        if leave_out_foreign_keys:
+            foreign_keys = __deferrable_foreign_keys(settings, model)
+
+        # Deferred foreign keys are left out of CREATE TABLE.
+        for field in foreign_keys:
+            field.deferred = True
+        try:
+            with partitioned_table(settings, model):
+                model._schema.create_table(safe=True)
+        finally:
+            for field in foreign_keys:
+                field.deferred = False
+
+        for index in model._meta.fields_to_index():
+            if index._unique or not settings.defer_indexes:
+                settings.db.execute(model._schema._create_index(index, safe=True))
+
+
+def add_season_column(settings, model):
+    """
+    Tables keyed by game created by an older version of nba-sql don't have a
+    `season_id`. Add it, and fill it in from the game table. Does nothing on a
+    new database, or once done.
+    """
+
+    db = settings.db
+    table_name = model._meta.table_name
+    if not db.table_exists(table_name):
+        return
+    if 'season_id' in {column.name for column in db.get_columns(table_name)}:
+        return
+
+    print(f"Adding season_id to {table_name}.")
+    ctx = db.get_sql_context()
+    with db.atomic():
+        db.execute(NodeList((
+            SQL('ALTER TABLE'),
+            Entity(table_name),
+            SQL('ADD COLUMN'),
+            model.season_id.ddl(ctx))))
+        # UPDATE doesn't alias the table, the outer column is named in full.
+        game_id = Entity(table_name, model.game_id.column_name)
+        (model
+         .update(season_id=Game.select(Game.season_id).where(Game.game_id == game_id))
+         .execute())
+
+
+def build_indexes(settings, quiet=False):
+    """
+    Create the indexes and foreign keys missing from the tables created by
+    `create_tables`. Safe to call again after an interrupted build.
+    """
+
+    db = settings.db
+    pending = []
+
+    for model in sort_models(settings.created_models):
+        table_name = model._meta.table_name
+        index_names = {index.name for index in db.get_indexes(table_name)}
+        for index in model._meta.fields_to_index():
+            if index._name not in index_names:
+                pending.append((model, index))
+
+    # Foreign keys last. MySQL adds its own index on a foreign key column if
+    # there isn't one yet.
+    for model in sort_models(settings.created_models):
+        foreign_keys = __deferrable_foreign_keys(settings, model)
+        if not foreign_keys or settings.db_type == 'duckdb':
+            continue
+        existing = {fk.column for fk in db.get_foreign_keys(model._meta.table_name)}
+        for field in foreign_keys:
+            if field.column_name not in existing:
+                pending.append((model, field))
+
+    if not pending:
+        return
+
+    index_bar = progress_bar(
+        pending,
+        prefix='Building indexes',
+        suffix='',
+        length=30,
+        quiet=quiet)
+
+    for model, item in index_bar:
+        if isinstance(item, ForeignKeyField):
+            try:
+                model._schema.create_foreign_key(item)
+            except DatabaseError as e:
+                # Keep going, the data is loaded and the other indexes are
+                # still worth having.
+                print(f"Could not add foreign key {model._meta.table_name}.{item.column_name}: {e}")
+        else:
+            db.execute(model._schema._create_index(item, safe=True))
+
+
+def __deferrable_foreign_keys(settings, model):
+    """
+    SQLite can't add a foreign key to an existing table, so they are only
+    deferred on Postgres and MySQL. On DuckDB they are left out for good.
+    """
+
+    if settings.db_type == 'sqlite' or model._meta.temporary:
+        return []
+    return [
+        field for field in model._meta.sorted_fields
+        if isinstance(field, ForeignKeyField) and not field.deferred
+    ]
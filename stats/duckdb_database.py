@@ -0,0 +1,212 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+DuckDB database for peewee, which doesn't ship one.
+
+DuckDB's Python API follows DB-API closely enough for peewee's base Database,
+with a few differences handled here:
+
+* `connection.cursor()` opens a second connection with its own transaction,
+  so queries run on the connection itself.
+* There is no AUTOINCREMENT. Auto ids take their default from a sequence,
+  and temp tables need a temp sequence of their own.
+* There are no savepoints. Nested `atomic()` blocks join the outer
+  transaction.
+"""
+
+import contextlib
+from itertools import islice
+
+from peewee import (
+    AutoField,
+    ColumnMetadata,
+    Database,
+    ImproperlyConfigured,
+    IndexMetadata,
+    InterfaceError,
+    PostgresqlDatabase,
+    __exception_wrapper__
+)
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Shared by the auto ids of every table. DuckDB doesn't allow a temp table to
+# depend on a sequence outside of the temp catalog.
+id_sequence = 'nba_sql_id_seq'
+temp_id_sequence = 'nba_sql_temp_id_seq'
+
+
+class ConnectionCursor:
+    """
+    Cursor over the connection. A connection holds one pending result, and
+    peewee may run a query while reading another one (lazy loading a foreign
+    key), so results are read in full when the query runs.
+    """
+
+    def __init__(self, connection):
+        """
+        Constructor.
+        """
+        self.connection = connection
+        self.description = None
+        self.rows = iter(())
+
+    def execute(self, sql, params=()):
+        self.connection.execute(sql, params)
+        self.description = self.connection.description
+        self.rows = iter(self.connection.fetchall() if self.description else ())
+        return self
+
+    def executemany(self, sql, params):
+        self.connection.executemany(sql, params)
+        self.description = None
+        self.rows = iter(())
+        return self
+
+    def fetchone(self):
+        return next(self.rows, None)
+
+    def fetchmany(self, size=1):
+        return list(islice(self.rows, size))
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def close(self):
+        # Closing the connection is left to peewee.
+        pass
+
+
+class DuckDBDatabase(Database):
+
+    param = '?'
+    field_types = {
+        'AUTO': 'INTEGER',
+        'BIGAUTO': 'BIGINT',
+        'BLOB': 'BLOB',
+        'BOOL': 'BOOLEAN',
+        'DATETIME': 'TIMESTAMP',
+        'DECIMAL': 'DECIMAL',
+        'DOUBLE': 'DOUBLE',
+        'FLOAT': 'DOUBLE',
+        'UUID': 'UUID',
+    }
+    # SQL for ON CONFLICT is the same as Postgres.
+    conflict_statement = PostgresqlDatabase.conflict_statement
+    conflict_update = PostgresqlDatabase.conflict_update
+    for_update = False
+    nulls_ordering = True
+    safe_create_index = True
+    safe_drop_index = True
+    truncate_table = True
+
+    def _connect(self):
+        if duckdb is None:
+            raise ImproperlyConfigured('DuckDB driver not installed!')
+        # Connections to the same file share one database instance, so each
+        # thread can hold its own.
+        return duckdb.connect(self.database, **self.connect_params)
+
+    def _initialize_connection(self, conn):
+        conn.execute(f'CREATE SEQUENCE IF NOT EXISTS {id_sequence}')
+        conn.execute(f'CREATE TEMP SEQUENCE IF NOT EXISTS {temp_id_sequence}')
+
+    def bind(self, models, bind_refs=True, bind_backrefs=True):
+        # Peewee adds DEFAULT NEXTVAL(...) for fields with a sequence.
+        for model in models:
+            field = model._meta.primary_key
+            if isinstance(field, AutoField) and not field.sequence:
+                field.sequence = temp_id_sequence if model._meta.temporary else id_sequence
+        return super().bind(models, bind_refs, bind_backrefs)
+
+    def cursor(self, commit=None, named_cursor=None):
+        if self.is_closed():
+            if self.autoconnect:
+                self.connect()
+            else:
+                raise InterfaceError('Error, database connection not opened.')
+        return ConnectionCursor(self._state.conn)
+
+    def commit(self):
+        with __exception_wrapper__:
+            return self._state.conn.commit()
+
+    def rollback(self):
+        with __exception_wrapper__:
+            return self._state.conn.rollback()
+
+    def savepoint(self):
+        return contextlib.nullcontext()
+
+    def last_insert_id(self, cursor, query_type=None):
+        # Ids are never read back after an insert.
+        return None
+
+    def rows_affected(self, cursor):
+        # DML returns a single row holding the count.
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def get_tables(self, schema=None):
+        cursor = self.execute_sql(
+            'SELECT table_name FROM information_schema.tables '
+            'WHERE table_schema = ? ORDER BY table_name',
+            (schema or 'main',))
+        return [table for table, in cursor.fetchall()]
+
+    def get_columns(self, table, schema=None):
+        cursor = self.execute_sql(
+            'SELECT column_name, data_type, is_nullable, column_default '
+            'FROM information_schema.columns '
+            'WHERE table_name = ? AND table_schema = ? ORDER BY ordinal_position',
+            (table, schema or 'main'))
+        primary_keys = set(self.get_primary_keys(table, schema))
+        return [
+            ColumnMetadata(name, data_type, nullable == 'YES', name in primary_keys, table, default)
+            for name, data_type, nullable, default in cursor.fetchall()
+        ]
+
+    def get_primary_keys(self, table, schema=None):
+        cursor = self.execute_sql(
+            'SELECT constraint_column_names FROM duckdb_constraints() '
+            "WHERE table_name = ? AND schema_name = ? AND constraint_type = 'PRIMARY KEY'",
+            (table, schema or 'main'))
+        row = cursor.fetchone()
+        return list(row[0]) if row else []
+
+    def get_indexes(self, table, schema=None):
+        cursor = self.execute_sql(
+            'SELECT index_name, sql, is_unique FROM duckdb_indexes() '
+            'WHERE table_name = ? AND schema_name = ?',
+            (table, schema or 'main'))
+        return [
+            IndexMetadata(name, sql, [], unique, table)
+            for name, sql, unique in cursor.fetchall()
+        ]
+
+    def get_foreign_keys(self, table, schema=None):
+        # Foreign keys are never created on DuckDB, see db_utils.create_tables.
+        return []
+
+    def sequence_exists(self, sequence):
+        cursor = self.execute_sql(
+            'SELECT 1 FROM duckdb_sequences() WHERE sequence_name = ?', (sequence,))
+        return cursor.fetchone() is not None
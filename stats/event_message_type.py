@@ -21,6 +21,7 @@ Initializer for the EventMessageType object.
 
 from models import EventMessageType
 from constants import event_message_types
+from db_utils import create_tables
 
 
 class EventMessageTypeBuilder:
@@ -33,7 +34,7 @@ class EventMessageTypeBuilder:
         """
         Initialize the table schema.
         """
-        self.settings.db.create_tables([EventMessageType], safe=True)
+        create_tables(self.settings, [EventMessageType])
 
     def initialize(self):
         """
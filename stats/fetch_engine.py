@@ -0,0 +1,110 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+Asyncio fetch engine. Keeps several requests in flight at once so the time
+spent waiting on the network overlaps, while the token bucket in the shared
+HTTP client decides how fast requests actually go out.
+"""
+
+import asyncio
+import concurrent.futures
+import queue
+import threading
+
+
+class FetchEngine:
+
+    # Marks the end of the result stream.
+    done = object()
+
+    def __init__(self, max_in_flight=4, queue_depth=None):
+        """
+        Constructor. At most `queue_depth` results wait for the consumer,
+        after that fetching pauses until it catches up. Defaults to
+        `max_in_flight`.
+        """
+        self.max_in_flight = max(max_in_flight, 1)
+        self.queue_depth = max(queue_depth or self.max_in_flight, 1)
+
+    def fetch(self, fetch_fn, items):
+        """
+        Call `fetch_fn` on every item, with up to `max_in_flight` calls
+        running at once. Yields (item, result) tuples in completion order.
+
+        `fetch_fn` is a regular blocking function, it is run in a thread pool
+        owned by the event loop.
+        """
+        results = queue.Queue(maxsize=self.queue_depth)
+        stop = threading.Event()
+
+        thread = threading.Thread(
+            target=asyncio.run,
+            args=(self.run(fetch_fn, items, results, stop),),
+            daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                entry = results.get()
+                if entry is self.done:
+                    break
+
+                item, result, error = entry
+                if error is not None:
+                    raise error
+                yield item, result
+        finally:
+            # Stop handing out new items if the consumer bailed early. The
+            # event loop may be blocked on a full queue, drain it until the
+            # loop exits.
+            stop.set()
+            while thread.is_alive():
+                try:
+                    results.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            thread.join()
+
+    async def run(self, fetch_fn, items, results, stop):
+        """
+        Event loop side. Start `max_in_flight` workers that share one
+        iterator over the items.
+        """
+        loop = asyncio.get_running_loop()
+        item_iter = iter(items)
+
+        async def worker(executor):
+            for item in item_iter:
+                if stop.is_set():
+                    return
+                try:
+                    result = await loop.run_in_executor(executor, fetch_fn, item)
+                except BaseException as e:
+                    stop.set()
+                    results.put((item, None, e))
+                    return
+                # Blocks the event loop while the queue is full, which keeps
+                # the other workers from starting new requests too.
+                results.put((item, result, None))
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+                await asyncio.gather(*[worker(executor) for _ in range(self.max_in_flight)])
+        finally:
+            # Always end the stream, the consumer is blocked on it.
+            results.put(self.done)
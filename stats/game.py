@@ -22,7 +22,7 @@ Game builder.
 from models import Game
 from constants import team_abbrev_mapping
 from collections import namedtuple
-from db_utils import insert_many, insert_many_on_conflict_ignore
+from db_utils import create_tables, insert_many, insert_many_on_conflict_ignore
 
 
 GameEntry = namedtuple("GameEntry", "season_id, game_id, game_date, matchup_in, winner, loser, playoff_game")
@@ -38,7 +38,7 @@ class GameBuilder:
         """
         Creates the game table from the model.
         """
-        self.settings.db.create_tables([Game], safe=True)
+        create_tables(self.settings, [Game])
 
     def game_id_predicate(self):
         """
@@ -1,12 +1,12 @@
-import requests
-
-from utils import get_rowset_mapping, column_names_from_table
-from constants import headers
-from db_utils import insert_many
+from db_utils import create_tables, insert_many
 
 
 class GenericRequester:
 
+    # Set on requesters whose requests are also made by another requester,
+    # so the response is fetched once and shared. See HttpClient.get_json.
+    shared_responses = False
+
     def __init__(self, settings, url, table):
         """
         Constructor.
@@ -23,7 +23,7 @@ class GenericRequester:
         """
         Initialize the table schema.
         """
-        self.settings.db.create_tables([self.table], safe=True)
+        create_tables(self.settings, [self.table])
 
     def generate_rows(self, params):
         """
@@ -31,22 +31,25 @@ class GenericRequester:
         """
 
         # json response
-        response = requests.get(url=self.url, headers=headers, params=params).json()
+        response = self.settings.http.get_json(self.url, params, self.shared_responses)
 
         result_sets = response['resultSets'][0]
         rowset = result_sets['rowSet']
 
-        column_names = column_names_from_table(self.settings.db, self.table._meta.table_name)
-
-        column_mapping = get_rowset_mapping(result_sets, column_names)
+        project = self.settings.schema.projector(self.table, result_sets)
 
         for row in rowset:
-            new_row = {column_name: row[row_index] for column_name, row_index in column_mapping.items()}
-            self.rows.append(new_row)
+            self.rows.append(project(row))
+
+    def insert_fields(self):
+        """
+        Fields of the tuples in `self.rows`.
+        """
+        return self.settings.schema.field_names(self.table)
 
     def populate(self):
         """
         Bulk insert. Remove row cache from object once finished.
         """
-        insert_many(self.settings, self.table, self.rows)
+        insert_many(self.settings, self.table, self.rows, self.insert_fields())
         self.rows = []
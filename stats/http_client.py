@@ -0,0 +1,258 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+Process-wide HTTP client. Every requester goes through the instance owned by
+the Settings object, so connections to the NBA API are kept alive between
+requests instead of doing a new TCP+TLS handshake for every call.
+"""
+
+import threading
+import time
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from constants import headers
+from response_cache import CacheMissError
+
+
+class RequestCoalescer:
+    """
+    Keeps the parsed response of requests that more than one requester makes
+    in a run, so each one is only fetched once. If a second caller asks for a
+    request that is still in flight, it waits for that response instead of
+    making its own.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self.responses = {}
+        self.pending = {}
+        self.saved = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, fetch):
+        """
+        Returns the shared response for `key`, calling `fetch` to get it if
+        nobody has yet.
+        """
+        with self.lock:
+            if key in self.responses:
+                self.saved += 1
+                return self.responses[key]
+
+            event = self.pending.get(key)
+            owner = event is None
+            if owner:
+                event = threading.Event()
+                self.pending[key] = event
+
+        if not owner:
+            event.wait()
+            # If the owner's fetch failed, there is nothing to share. Try again.
+            return self.get(key, fetch)
+
+        try:
+            body = fetch()
+            with self.lock:
+                self.responses[key] = body
+        finally:
+            with self.lock:
+                del self.pending[key]
+            event.set()
+
+        return body
+
+
+class HttpClient:
+
+    # Responses that mean we are being throttled or the API is struggling.
+    retry_status_codes = {429, 500, 502, 503, 504}
+
+    def __init__(self, pool_size=10, limiter=None, controller=None, timeout=30, retries=3, cache=None):
+        """
+        Constructor. `pool_size` is the number of keep-alive connections
+        held open per host. `limiter` is an optional TokenBucket that every
+        request has to take a token from, and `controller` an optional
+        AdaptiveRateController that is fed the outcome of every request.
+        `cache` is an optional ResponseCache checked before the network.
+        """
+        self.pool_size = pool_size
+        self.limiter = limiter
+        self.controller = controller
+        self.cache = cache
+        self.timeout = timeout
+        self.retries = retries
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.coalescer = RequestCoalescer()
+        self.hosts = set()
+        self.lock = threading.Lock()
+
+    def get_json(self, url, params, shared=False):
+        """
+        GET the url with the passed params and return the decoded JSON body.
+
+        If `shared` is set, the parsed response is kept for the rest of the
+        run and handed to any other requester making the same request. Only
+        use this for small responses that are requested more than once, and
+        don't modify the returned body.
+        """
+        if shared:
+            if not isinstance(params, str):
+                params = urllib.parse.urlencode(params, safe=':+')
+            return self.coalescer.get((url, params), lambda: self.fetch_json(url, params))
+
+        return self.fetch_json(url, params)
+
+    def fetch_json(self, url, params):
+        """
+        Does the work for get_json, without coalescing.
+
+        Throttled responses (HTTP 429 / 5xx), timeouts, and responses with an
+        empty `resultSets` are retried up to `retries` times with a growing
+        backoff.
+        """
+        if self.cache is not None:
+            body = self.cache.get(url, params)
+            if body is not None:
+                return body
+            if self.cache.offline:
+                raise CacheMissError(f"No cached response for {url}?{params}")
+
+        parsed = urllib.parse.urlsplit(url)
+        with self.lock:
+            self.hosts.add(f"{parsed.scheme}://{parsed.netloc}")
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+
+            if self.limiter is not None:
+                self.limiter.acquire()
+
+            try:
+                response = self.session.get(url=url, params=params, timeout=self.timeout)
+            except (requests.Timeout, requests.ConnectionError):
+                self.record(False)
+                if last_attempt:
+                    raise
+                self.backoff(attempt)
+                continue
+
+            if response.status_code in self.retry_status_codes:
+                self.record(False)
+                if last_attempt:
+                    response.raise_for_status()
+                self.backoff(attempt)
+                continue
+
+            body = response.json()
+
+            # The API sometimes answers a throttled request with no result sets.
+            if isinstance(body, dict) and body.get('resultSets') == []:
+                self.record(False)
+                if last_attempt:
+                    return body
+                self.backoff(attempt)
+                continue
+
+            self.record(True)
+            if self.cache is not None:
+                self.cache.put(url, params, body)
+            return body
+
+    def record(self, success):
+        """
+        Feed the outcome of a request to the rate controller, if any.
+        """
+        if self.controller is None:
+            return
+        if success:
+            self.controller.record_success()
+        else:
+            self.controller.record_failure()
+
+    def backoff(self, attempt):
+        """
+        Sleep before retrying a failed request.
+        """
+        time.sleep(2 ** attempt)
+
+    def describe_rate(self):
+        """
+        Short string of the current request rate, for progress output.
+        """
+        if self.limiter is None:
+            return 'unlimited'
+        return self.limiter.describe()
+
+    def connection_stats(self):
+        """
+        Returns a dict of host to a (requests, connections) tuple, read from
+        the underlying urllib3 connection pools.
+        """
+        stats = {}
+        with self.lock:
+            hosts = sorted(self.hosts)
+
+        for host in hosts:
+            pools = self.session.get_adapter(host).poolmanager.pools
+            parsed = urllib.parse.urlsplit(host)
+            num_requests = 0
+            num_connections = 0
+
+            # There can be more than one pool per host, keyed on TLS settings.
+            for key in pools.keys():
+                if key.key_scheme == parsed.scheme and key.key_host == parsed.hostname:
+                    pool = pools[key]
+                    num_requests += pool.num_requests
+                    num_connections += pool.num_connections
+
+            stats[host] = (num_requests, num_connections)
+
+        return stats
+
+    def print_stats(self):
+        """
+        Print per-host connection reuse and the final request rate.
+        """
+        print(f"Request rate: {self.describe_rate()}.")
+        if self.coalescer.saved:
+            print(f"Duplicate requests coalesced: {self.coalescer.saved}.")
+        if self.cache is not None:
+            self.cache.print_stats()
+        for host, (num_requests, num_connections) in self.connection_stats().items():
+            reused = max(num_requests - num_connections, 0)
+            print(
+                f"{host}: {num_requests} requests over {num_connections} connections "
+                f"({reused} reused)."
+            )
+
+    def close(self):
+        """
+        Close all pooled connections.
+        """
+        self.session.close()
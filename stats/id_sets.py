@@ -0,0 +1,47 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+Compact in-memory sets of ids. The team / player / season units of every
+loaded season are held at once; stored as Python sets of tuples they take
+several times the memory of the ids themselves. These keep them in arrays of
+machine integers instead.
+"""
+
+from array import array
+
+
+class IdTuples:
+    """
+    List of tuples of integer ids, e.g. (team_id, player_id, season_id),
+    stored as one array of `typecode` per position. Tuples are built when
+    iterating.
+    """
+
+    def __init__(self, width, rows=(), typecode='q'):
+        self.columns = [array(typecode) for _ in range(width)]
+        for row in rows:
+            self.append(row)
+
+    def append(self, row):
+        for column, value in zip(self.columns, row):
+            column.append(value)
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def __iter__(self):
+        return zip(*self.columns)
@@ -0,0 +1,121 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+Load watermarks, used to refresh the current season incrementally.
+
+The last game loaded into each table is recorded per season. A refresh only
+requests the games played since the oldest watermark of the tables it
+refreshes, instead of the whole season.
+"""
+
+from peewee import fn
+
+from models import Game, LoadWatermark
+
+from db_utils import create_tables, insert_many
+from utils import chunk_list
+
+
+class LoadWatermarks:
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.settings.db.bind([LoadWatermark])
+
+    def create_ddl(self):
+        """
+        Creates the load_watermark table.
+        """
+        create_tables(self.settings, [LoadWatermark])
+
+    def get(self, table_name, season_id):
+        """
+        Returns the watermark of a table in a season, or None.
+        """
+        return (LoadWatermark
+                .select()
+                .where((LoadWatermark.table_name == table_name) & (LoadWatermark.season_id == season_id))
+                .first())
+
+    def since(self, table_names, season_id):
+        """
+        Returns the date to refresh the tables from, the oldest of their
+        watermarks. Tables without one, e.g. in a database loaded by an older
+        version of nba-sql, start at the last game of the season in the game
+        table. None if the season has no games yet.
+
+        The date itself is refreshed again, its games may not all have been
+        over at the last refresh.
+        """
+        dates = []
+        for table_name in table_names:
+            watermark = self.get(table_name, season_id)
+            if watermark is not None:
+                dates.append(str(watermark.game_date)[:10])
+                continue
+            last_game_date = (Game
+                              .select(fn.MAX(Game.date))
+                              .where(Game.season_id == season_id)
+                              .scalar())
+            if last_game_date is None:
+                return None
+            dates.append(str(last_game_date)[:10])
+
+        return min(dates) if dates else None
+
+    def advance(self, table_name, season_id, game_set):
+        """
+        Move the watermark of a table to the last game of `game_set`, a set of
+        GameEntry tuples. Call once their rows are loaded. Never moves back.
+        """
+        if not game_set:
+            return
+        last = max(game_set, key=lambda entry: (str(entry.game_date)[:10], int(entry.game_id)))
+        game_date = str(last.game_date)[:10]
+
+        watermark = self.get(table_name, season_id)
+        if watermark is not None and str(watermark.game_date)[:10] > game_date:
+            return
+
+        row = {
+            'table_name': table_name,
+            'season_id': season_id,
+            'game_date': game_date,
+            'game_id': int(last.game_id)
+        }
+        with self.settings.db.atomic():
+            (LoadWatermark
+             .delete()
+             .where((LoadWatermark.table_name == table_name) & (LoadWatermark.season_id == season_id))
+             .execute())
+            insert_many(self.settings, LoadWatermark, [row])
+
+
+def missing_game_ids(model, game_ids):
+    """
+    Returns the ids of `game_ids` that have no rows in the table of `model`,
+    formatted like the passed ids.
+    """
+    loaded = set()
+    for chunk in chunk_list(sorted(game_ids), 500):
+        query = (model
+                 .select(model.game_id)
+                 .where(model.game_id.in_([int(game_id) for game_id in chunk]))
+                 .distinct()
+                 .tuples())
+        loaded.update(game_id for (game_id,) in query)
+    return {game_id for game_id in game_ids if int(game_id) not in loaded}
@@ -0,0 +1,45 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+LoadJournal model definition.
+"""
+
+from datetime import datetime
+
+from peewee import (
+    CharField,
+    DateTimeField,
+    Model,
+    CompositeKey
+)
+
+
+class LoadJournal(Model):
+
+    # Composite PK Fields
+    table_name = CharField()
+    unit = CharField()
+
+    completed_at = DateTimeField(default=datetime.now)
+
+    class Meta:
+        db_table = 'load_journal'
+        primary_key = CompositeKey(
+            'table_name',
+            'unit'
+        )
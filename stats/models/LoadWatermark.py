@@ -0,0 +1,52 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+
+LoadWatermark model definition.
+"""
+
+from datetime import datetime
+
+from peewee import (
+    CharField,
+    DateField,
+    DateTimeField,
+    IntegerField,
+    Model,
+    CompositeKey
+)
+
+
+class LoadWatermark(Model):
+
+    # Composite PK Fields
+    table_name = CharField()
+    season_id = IntegerField()
+
+    # Last game loaded into the table.
+    game_date = DateField()
+    game_id = IntegerField()
+
+    updated_at = DateTimeField(default=datetime.now)
+
+    class Meta:
+        db_table = 'load_watermark'
+        primary_key = CompositeKey(
+            'table_name',
+            'season_id'
+        )
@@ -30,6 +30,9 @@ class PlayByPlay(Model):
 
     # Indexes
     game_id = ForeignKeyField(Game, index=True)
+    # Season of the game, see utils.game_id_to_season_int. The partition key
+    # with --partition-seasons.
+    season_id = IntegerField(null=True)
 
     event_num = IntegerField()
     event_msg_type = ForeignKeyField(EventMessageType, index=True)
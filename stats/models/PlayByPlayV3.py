@@ -28,6 +28,8 @@ class PlayByPlayV3(Model):
 
     # Indexes
     game_id = ForeignKeyField(Game, index=True, null=False)
+    # Season of the game, see PlayByPlay.
+    season_id = IntegerField(null=True)
     player_id = ForeignKeyField(Player, index=True, null=True)
     team_id = ForeignKeyField(Team, index=True, null=True)
 
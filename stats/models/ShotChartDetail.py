@@ -40,6 +40,8 @@ class ShotChartDetail(Model):
     game_id = ForeignKeyField(Game, index=True, unique=False)
     player_id = ForeignKeyField(Player, index=True, unique=False)
     team_id = ForeignKeyField(Team, index=True, unique=False)
+    # Season of the game, see PlayByPlay.
+    season_id = IntegerField(null=True)
 
     game_event_id = IntegerField(null=True)
     period = IntegerField(null=True)
@@ -61,3 +63,7 @@ class ShotChartDetail(Model):
 
     class Meta:
         db_table = 'shot_chart_detail'
+        indexes = (
+            # Key of the merge from shot_chart_detail_temp.
+            (('game_id', 'game_event_id', 'player_id'), False),
+        )
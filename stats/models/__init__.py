@@ -27,6 +27,8 @@ from .Season import Season
 
 # Misc Tables
 from .EventMessageType import EventMessageType
+from .LoadJournal import LoadJournal
+from .LoadWatermark import LoadWatermark
 
 # Team Tables
 from .TeamSeason import TeamSeason
@@ -48,6 +50,8 @@ __all__ = [
     Game,
     Season,
     EventMessageType,
+    LoadJournal,
+    LoadWatermark,
     TeamSeason,
     TeamGameLog,
     PlayerSeason,
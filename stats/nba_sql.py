@@ -35,17 +35,44 @@ from play_by_playv3 import PlayByPlayV3Requester
 from shot_chart_detail import ShotChartDetailRequester
 
 from constants import team_ids
+from daemon import PollSchedule, RefreshDaemon, StatusFile
+from models import PlayByPlay, PlayByPlayV3, ShotChartDetail
+from db_utils import build_indexes
 from settings import Settings
-from utils import progress_bar, generate_valid_seasons, generate_valid_season
+from fetch_engine import FetchEngine
+from pipeline import WriterPipeline
+from parquet_export import ParquetExporter
+from partitions import clear_season, partitioned_models
+from progress_journal import ProgressJournal
+from load_watermark import LoadWatermarks, missing_game_ids
+from scheduler import Stage, StageScheduler
+from sqlite_bulk import SqliteBulkLoad
+from utils import progress_bar, generate_valid_seasons, generate_valid_season, season_id_to_int
 
 from args import create_parser
 
-import concurrent.futures
+from collections import namedtuple
 import argparse
-import time
-import copy
+import contextlib
 import sys
 
+# Number of team / player pairs of shot_chart_detail staged before moving
+# them into the main table.
+shot_chart_checkpoint_size = 100
+
+# Tables refreshed by the current season mode that keep a watermark, other
+# than the game table.
+watermark_tables = ['player_game_log', 'play_by_play', 'play_by_playv3', 'shot_chart_detail']
+
+# Requesters of the current season mode. The daemon builds them once and
+# reuses them for every refresh.
+CurrentSeasonRequesters = namedtuple(
+    "CurrentSeasonRequesters",
+    "player, player_game_log, game, shot_chart, play_by_play, play_by_playv3, season, watermarks")
+
+# Number of play by play rows handed to the writer at once.
+play_by_play_batch_size = 100000
+
 description = """
     nba_sql application.
 
@@ -58,10 +85,15 @@ description = """
 
 
 # TODO: load these args into the settings class.
-def default_mode(settings, create_schema, request_gap, seasons, skip_tables, quiet):
+def default_mode(settings, create_schema, seasons, skip_tables, quiet, resume=False, reload=False):
     """
     The default mode of loading data. This is for initializing the database
     and loading specific seasons.
+
+    Progress is recorded in the load_journal table as each unit of work is
+    committed. With `resume`, units that were already loaded are skipped.
+    With `reload`, the seasons are loaded again into a database that has
+    them, see `reload_seasons`.
     """
 
     print("Loading the database in the default mode.")
@@ -71,6 +103,8 @@ def default_mode(settings, create_schema, request_gap, seasons, skip_tables, qui
     event_message_type_builder = EventMessageTypeBuilder(settings)
     game_builder = GameBuilder(settings)
     season_builder = SeasonBuilder(settings)
+    journal = ProgressJournal(settings)
+    watermarks = LoadWatermarks(settings)
 
     player_season_requester = PlayerSeasonRequester(settings)
     player_game_log_requester = PlayerGameLogRequester(settings)
@@ -86,6 +120,8 @@ def default_mode(settings, create_schema, request_gap, seasons, skip_tables, qui
         event_message_type_builder,
         game_builder,
         season_builder,
+        journal,
+        watermarks,
 
         # Dependent Objects
         player_season_requester,
@@ -99,135 +135,303 @@ def default_mode(settings, create_schema, request_gap, seasons, skip_tables, qui
     if create_schema:
         do_create_schema(object_list)
 
+    # Everything but the reloaded rows is kept, as on a resume.
+    if reload:
+        resume = True
+
+    if resume:
+        print("Resuming, previously loaded data will be skipped.")
+    else:
+        journal.clear()
+
     season_builder.populate(seasons)
 
-    if 'team' not in skip_tables:
+    if reload:
+        reload_seasons(settings, journal, game_builder, seasons, skip_tables)
+
+    # Shared between stages, filled in by the player_game_log stage.
+    loaded = {}
+
+    def load_team():
+        if 'team' in skip_tables or journal.is_done('team'):
+            return
         print('Populating team table.')
 
         team_bar = progress_bar(team_ids, prefix='team Table Loading', suffix='', length=30, quiet=quiet)
         for team_id in team_bar:
             team_requester.generate_rows(team_id)
-            time.sleep(request_gap)
 
-        team_requester.populate()
+        with settings.db.atomic():
+            team_requester.populate()
+            journal.mark_done('team')
 
-    if 'event_message_type' not in skip_tables:
+    def load_event_message_type():
+        if 'event_message_type' in skip_tables or journal.is_done('event_message_type'):
+            return
         print('Loading event types.')
-        event_message_type_builder.initialize()
+        with settings.db.atomic():
+            event_message_type_builder.initialize()
+            journal.mark_done('event_message_type')
 
-    if 'player' not in skip_tables:
+    def load_player():
+        if 'player' in skip_tables:
+            return
         print('Populating player data')
 
-        player_bar = progress_bar(seasons, prefix='player Table Loading', suffix='', length=30, quiet=quiet)
+        player_seasons = pending_units(journal, 'player', seasons)
+        player_bar = progress_bar(player_seasons, prefix='player Table Loading', suffix='', length=30, quiet=quiet)
         for season_id in player_bar:
             player_requester.generate_rows(season_id)
-            time.sleep(request_gap)
-        player_requester.populate()
-
-    player_game_seasons_bar = progress_bar(
-        seasons,
-        prefix='Loading player_game_log regular season data',
-        suffix='This one will take a while...',
-        length=30,
-        quiet=quiet)
 
-    # Fetch player_game_log and build game_id set.
-    for season_id in player_game_seasons_bar:
-
-        player_game_log_requester.fetch_season(season_id, False)
-        time.sleep(request_gap)
-
-    player_game_seasons_bar = progress_bar(
-        seasons,
-        prefix='Loading player_game_log playoff season data',
-        suffix='This one will take a while...',
-        length=30,
-        quiet=quiet)
+        with settings.db.atomic():
+            player_requester.populate()
+            journal.mark_done('player', player_seasons)
 
-    for season_id in player_game_seasons_bar:
-        player_game_log_requester.fetch_season(season_id, True)
-        time.sleep(request_gap)
+    def load_player_game_log():
+        # Every season is written with its games as soon as it is fetched, so
+        # only one season of rows is held at a time. Seasons loaded before a
+        # resume are skipped.
+        player_game_log_seasons = pending_units(journal, 'player_game_log', seasons)
 
-    game_set = player_game_log_requester.get_game_set()
-
-    # Fetch ids from tuples.
-    game_list = [game[1] for game in game_set]
-
-    game_progress_bar = progress_bar(
-        game_list,
-        prefix='Loading PlayByPlay Data',
-        length=30,
-        quiet=quiet)
-
-    # First, load game specific data.
-    if 'game' not in skip_tables:
-        print('Loading cached game table.')
-        game_builder.populate_table(game_set)
-
-    if 'play_by_play' not in skip_tables:
+        player_game_seasons_bar = progress_bar(
+            player_game_log_seasons,
+            prefix='Loading player_game_log data',
+            suffix='This one will take a while...',
+            length=30,
+            quiet=quiet,
+            status=settings.http.describe_rate)
+
+        # Games of the fetched seasons, when there is no game table to read
+        # them back from.
+        fetched_game_ids = {}
+
+        # Fetch player_game_log and build the season's game set.
+        for season_id in player_game_seasons_bar:
+
+            player_game_log_requester.fetch_season(season_id, False)
+            player_game_log_requester.fetch_season(season_id, True)
+            if 'game' in skip_tables:
+                fetched_game_ids[season_id] = [game.game_id for game in player_game_log_requester.get_game_set()]
+
+            with settings.db.atomic():
+                if 'game' not in skip_tables:
+                    game_builder.populate_table(player_game_log_requester.get_game_set(), resume)
+                if 'player_game_log' not in skip_tables:
+                    player_game_log_requester.populate()
+                    journal.mark_done('player_game_log', [season_id])
+
+            player_game_log_requester.clear()
+
+        # Games of every season, loaded now or before a resume, are read
+        # back from the game table. Without it, from the fetched rows, or the
+        # player_game_log table for seasons loaded before a resume.
+        game_list = []
+        for season_id in seasons:
+            season_int = season_id_to_int(season_id)
+            if 'game' not in skip_tables:
+                game_ids = game_builder.fetch_season_game_id_set(season_int)
+            elif season_id in fetched_game_ids:
+                game_ids = fetched_game_ids[season_id]
+            else:
+                game_ids = player_game_log_requester.fetch_season_game_id_set(season_int)
+            game_list += sorted(game_ids)
+        loaded['game_list'] = game_list
+
+    def load_play_by_play():
+        if 'play_by_play' in skip_tables:
+            return
         play_by_play_helper(
-            play_by_play_requester, 
-            player_requester, 
-            game_list, 
+            play_by_play_requester,
+            player_requester,
+            pending_units(journal, 'play_by_play', loaded['game_list']),
             'Loading PlayByPlay Data',
+            settings,
             quiet,
-            request_gap)
+            journal,
+            'play_by_play')
 
-    if 'play_by_playv3' not in skip_tables:
+    def load_play_by_playv3():
+        if 'play_by_playv3' in skip_tables:
+            return
         play_by_play_helper(
-            play_by_playv3_requester, 
-            player_requester, 
-            game_list, 
+            play_by_playv3_requester,
+            player_requester,
+            pending_units(journal, 'play_by_playv3', loaded['game_list']),
             'Loading PlayByPlayV3 Data',
+            settings,
             quiet,
-            request_gap)
+            journal,
+            'play_by_playv3')
 
-    if 'player_game_log' not in skip_tables:
-
-        print("Starting PlayerGameLog Insert")
-        player_game_log_requester.populate()
-        print("Finished PlayerGameLog Insert")
+    def load_shot_chart_detail():
+        if 'shot_chart_detail' in skip_tables:
+            return
 
-    if 'shot_chart_detail' not in skip_tables:
+        # The temp table has to exist on this stage's connection.
+        shot_chart_requester.create_temp_table()
 
         print("Fetching set of team_id and player_ids for the ShotChartData.")
-        team_player_set = player_game_log_requester.get_team_player_id_set()
+        season_ids = [season_id_to_int(season_id) for season_id in seasons]
+        team_player_set = player_game_log_requester.get_team_player_id_set(season_ids)
         print("Finished fetching.")
-        shot_chart_bar = progress_bar(
+
+        id_tuple_list = pending_units(
+            journal,
+            'shot_chart_detail',
             team_player_set,
+            shot_chart_unit)
+
+        shot_chart_bar = progress_bar(
+            id_tuple_list,
             prefix='Loading Shot Chart Data',
             suffix='',
             length=30,
-            quiet=quiet)
+            quiet=quiet,
+            status=settings.http.describe_rate)
 
+        # Rows are staged in the temp table, which does not survive a crash.
+        # Every so often move them into the main table and record the pairs.
+        checkpoint_units = []
         for id_tuple in shot_chart_bar:
 
-            shot_chart_requester.generate_rows(id_tuple[0], id_tuple[1])
+            shot_chart_requester.generate_rows(*id_tuple)
             shot_chart_requester.populate()
-            time.sleep(request_gap)
+            checkpoint_units.append(shot_chart_unit(id_tuple))
 
-        shot_chart_requester.finalize(game_builder.game_id_predicate())
+            if len(checkpoint_units) >= shot_chart_checkpoint_size:
+                shot_chart_checkpoint(shot_chart_requester, journal, checkpoint_units)
+                checkpoint_units = []
 
-    season_bar = progress_bar(
-        seasons,
-        prefix='Loading Seasonal Data',
-        suffix='This one will take a while...',
-        length=30,
-        quiet=quiet)
+        print('Inserting from shot_chart_detail temp table into main table.')
+        shot_chart_checkpoint(shot_chart_requester, journal, checkpoint_units)
+        print('Insert finished.')
+
+    def load_player_season():
+        if 'player_season' in skip_tables:
+            return
+
+        season_bar = progress_bar(
+            pending_units(journal, 'player_season', seasons),
+            prefix='Loading player_season data',
+            suffix='',
+            length=30,
+            quiet=quiet,
+            status=settings.http.describe_rate)
+
+        # Fetch outside the transaction, so other stages aren't blocked on
+        # the network while this one holds the write lock.
+        for season_id in season_bar:
+            player_season_requester.fetch_season(season_id)
+            with settings.db.atomic():
+                player_season_requester.populate()
+                journal.mark_done('player_season', [season_id])
+
+    def load_pgtt():
+        if 'pgtt' in skip_tables:
+            return
+
+        season_bar = progress_bar(
+            pending_units(journal, 'pgtt', seasons),
+            prefix='Loading pgtt data',
+            suffix='',
+            length=30,
+            quiet=quiet,
+            status=settings.http.describe_rate)
+
+        for season_id in season_bar:
+            pgtt_requester.fetch_season(season_id)
+            with settings.db.atomic():
+                pgtt_requester.populate()
+                journal.mark_done('pgtt', [season_id])
+
+    # Stages are declared in the order they ran before the scheduler, which
+    # is the order used when running one at a time.
+    stages = [
+        Stage('team', load_team),
+        Stage('event_message_type', load_event_message_type),
+        Stage('player', load_player),
+        Stage('player_game_log', load_player_game_log, ['team', 'player']),
+        Stage('play_by_play', load_play_by_play, ['player_game_log', 'event_message_type']),
+        Stage('play_by_playv3', load_play_by_playv3, ['player_game_log']),
+        Stage('shot_chart_detail', load_shot_chart_detail, ['player_game_log']),
+        Stage('player_season', load_player_season, ['player']),
+        Stage('pgtt', load_pgtt, ['player']),
+    ]
+
+    profile = SqliteBulkLoad(settings) if settings.sqlite_bulk_load else contextlib.nullcontext()
+    with profile:
+        StageScheduler(settings.parallel_stages, settings.db).run(stages)
 
-    # Load seasonal data.
-    for season_id in season_bar:
-        if 'player_season' not in skip_tables:
-            player_season_requester.populate_season(season_id)
-            time.sleep(request_gap)
+        # Also finishes the build of a load with deferred indexes that was
+        # resumed without the flag.
+        if create_schema:
+            build_indexes(settings, quiet)
 
-        if 'pgtt' not in skip_tables:
-            pgtt_requester.generate_rows(season_id)
-            time.sleep(request_gap)
+    if settings.parquet_dir is not None:
+        season_ids = [season_id_to_int(season) for season in seasons]
+        ParquetExporter(settings, settings.parquet_dir).export(season_ids, skip_tables, quiet)
+
+    if not quiet:
+        settings.http.print_stats()
 
     print("Done! Enjoy the hot, fresh database.")
 
 
+def pending_units(journal, table_name, items, unit_fn=str):
+    """
+    Filters out the items whose journal unit was already loaded for a table.
+    """
+    completed = journal.completed_units(table_name)
+    return [item for item in items if unit_fn(item) not in completed]
+
+
+def reload_seasons(settings, journal, game_builder, seasons, skip_tables):
+    """
+    Remove the rows of the seasons from the tables keyed by season, and forget
+    their journal units, so the load that follows fetches them again. The
+    tables are emptied with `partitions.clear_season`.
+    """
+    for season_id in seasons:
+        season_int = season_id_to_int(season_id)
+        game_ids = game_builder.fetch_season_game_id_set(season_int)
+        units = {
+            'player_game_log': [season_id],
+            'play_by_play': game_ids,
+            'play_by_playv3': game_ids,
+            'shot_chart_detail': [
+                unit for unit in journal.completed_units('shot_chart_detail')
+                if unit.endswith(f"-{season_int}")
+            ],
+        }
+
+        print(f"Clearing season {season_id} for the reload.")
+        with settings.db.atomic():
+            for model in partitioned_models:
+                table_name = model._meta.table_name
+                if table_name in skip_tables:
+                    continue
+                clear_season(settings, model, season_int)
+                journal.forget(table_name, units[table_name])
+
+
+def shot_chart_unit(id_tuple):
+    """
+    Journal unit of a team / player / season of shot_chart_detail.
+    """
+    return "-".join(str(value) for value in id_tuple)
+
+
+def shot_chart_checkpoint(shot_chart_requester, journal, units):
+    """
+    Move the staged shot_chart_detail rows into the main table and record the
+    team / player / seasons they came from, in one transaction.
+    """
+    with shot_chart_requester.settings.db.atomic():
+        shot_chart_requester.insert_from_temp()
+        shot_chart_requester.clear_temp()
+        journal.mark_done('shot_chart_detail', units)
+
+
 def do_create_schema(object_list):
     """
     Function to initialize database schema.
@@ -238,18 +442,48 @@ def do_create_schema(object_list):
         obj.create_ddl()
 
 
-def current_season_mode(settings, request_gap, skip_tables, quiet):
+def current_season_requesters(settings):
+    """
+    Builds the requesters of the current season mode.
+    """
+    watermarks = LoadWatermarks(settings)
+    watermarks.create_ddl()
+
+    return CurrentSeasonRequesters(
+        player=PlayerRequester(settings),
+        player_game_log=PlayerGameLogRequester(settings),
+        game=GameBuilder(settings),
+        shot_chart=ShotChartDetailRequester(settings),
+        play_by_play=PlayByPlayRequester(settings),
+        play_by_playv3=PlayByPlayV3Requester(settings),
+        season=SeasonBuilder(settings),
+        watermarks=watermarks)
+
+
+def current_season_mode(settings, skip_tables, quiet, requesters=None):
     """
     Refreshes the current season in a previously existing database.
+
+    `requesters`, from `current_season_requesters`, can be passed to reuse
+    them across refreshes. Returns counts of what was loaded.
     """
 
-    player_requester = PlayerRequester(settings)
-    player_game_log_requester = PlayerGameLogRequester(settings)
-    game_builder = GameBuilder(settings)
-    shot_chart_requester = ShotChartDetailRequester(settings)
-    play_by_play_requester = PlayByPlayRequester(settings)
-    play_by_playv3_requester = PlayByPlayV3Requester(settings)
-    season_builder = SeasonBuilder(settings)
+    if requesters is None:
+        requesters = current_season_requesters(settings)
+
+    player_requester = requesters.player
+    player_game_log_requester = requesters.player_game_log
+    game_builder = requesters.game
+    shot_chart_requester = requesters.shot_chart
+    play_by_play_requester = requesters.play_by_play
+    play_by_playv3_requester = requesters.play_by_playv3
+    season_builder = requesters.season
+    watermarks = requesters.watermarks
+
+    # Leftovers of the previous refresh, when the requesters are reused.
+    player_game_log_requester.reset()
+    shot_chart_requester.create_temp_table()
+    shot_chart_requester.clear_temp()
 
     season_id = season_builder.current_season_loaded()
 
@@ -264,19 +498,24 @@ def current_season_mode(settings, request_gap, skip_tables, quiet):
 
     season = generate_valid_season(season_id)
 
+    # Games are only requested since the oldest watermark of the refreshed
+    # tables, the game table always is.
+    refreshed_tables = ['game'] + [
+        table_name for table_name in watermark_tables if table_name not in skip_tables
+    ]
+    since = watermarks.since(refreshed_tables, season_id)
+
     if not quiet:
-        print("Fetching current season data.")
+        if since is None:
+            print("Fetching current season data.")
+        else:
+            print(f"Fetching current season data since {since}.")
 
     game_set_old = game_builder.fetch_season_game_id_set(season_id)
 
-    player_game_log_requester.fetch_season(season, False)
-    time.sleep(request_gap)
-    player_game_log_requester.fetch_season(season, True)
+    player_game_log_requester.fetch_season(season, False, since)
+    player_game_log_requester.fetch_season(season, True, since)
     player_game_log_requester.populate_temp()
-    time.sleep(request_gap)
-
-    if 'player_game_log' not in skip_tables:
-        player_game_log_requester.insert_from_temp_into_reg()
 
     game_set = player_game_log_requester.get_game_set()
     game_set_new = set([game[1] for game in game_set])
@@ -284,50 +523,115 @@ def current_season_mode(settings, request_gap, skip_tables, quiet):
     game_set_net_new = game_set_new.difference(game_set_old)
     print(f"Net new games found: {len(game_set_net_new)}")
 
+    counts = {
+        'season_id': season_id,
+        'since': since,
+        'games': len(game_set_new),
+        'new_games': len(game_set_net_new),
+        'player_game_log_rows': len(player_game_log_requester.get_rows())
+    }
+
     # Insert new games and ignore duplicates, becuase its difficult to
     # do this the correct way.
     game_builder.populate_table(game_set, True)
+    watermarks.advance('game', season_id, game_set)
+
+    if 'player_game_log' not in skip_tables:
+        player_game_log_requester.insert_from_temp_into_reg()
+        watermarks.advance('player_game_log', season_id, game_set)
 
-    game_list = list(game_set_net_new)
+    # Games of the refreshed range missing from a table, e.g. after a refresh
+    # that died part way through, are loaded along with the new ones.
     if 'play_by_play' not in skip_tables:
+        game_list = sorted(missing_game_ids(PlayByPlay, game_set_new))
+        counts['play_by_play_games'] = len(game_list)
         play_by_play_helper(
-            play_by_play_requester, 
-            player_requester, 
-            game_list, 
+            play_by_play_requester,
+            player_requester,
+            game_list,
             'Loading PlayByPlay Data',
-            quiet,
-            request_gap)
+            settings,
+            quiet)
+        watermarks.advance('play_by_play', season_id, game_set)
 
     if 'play_by_playv3' not in skip_tables:
+        game_list = sorted(missing_game_ids(PlayByPlayV3, game_set_new))
+        counts['play_by_playv3_games'] = len(game_list)
         play_by_play_helper(
-            play_by_playv3_requester, 
-            player_requester, 
-            game_list, 
+            play_by_playv3_requester,
+            player_requester,
+            game_list,
             'Loading PlayByPlayV3 Data',
-            quiet,
-            request_gap)
+            settings,
+            quiet)
+        watermarks.advance('play_by_playv3', season_id, game_set)
 
     if 'shot_chart_detail' not in skip_tables:
-        team_player_set = player_game_log_requester.get_team_player_id_set(True)
+        # Only the players of the new games, and only since their first one.
+        # Shot charts are requested for the regular season only.
+        regular_season_games = set([game.game_id for game in game_set if not game.playoff_game])
+        first_games = player_game_log_requester.get_team_player_id_set_for_games(
+            missing_game_ids(ShotChartDetail, regular_season_games))
+        counts['shot_chart_requests'] = len(first_games)
 
         shot_chart_bar = progress_bar(
-            team_player_set,
+            list(first_games.items()),
             prefix='Loading Shot Chart Data',
             suffix='',
             length=30,
-            quiet=quiet)
+            quiet=quiet,
+            status=settings.http.describe_rate)
 
-        for id_tuple in shot_chart_bar:
+        for id_tuple, first_game_date in shot_chart_bar:
 
-            shot_chart_requester.generate_rows(id_tuple[0], id_tuple[1])
+            shot_chart_requester.generate_rows(*id_tuple, date_from=first_game_date)
             shot_chart_requester.populate()
-            time.sleep(request_gap)
 
-        scd_predicate = shot_chart_requester.temp_table_except_predicate()
-        shot_chart_requester.finalize(scd_predicate)
+        shot_chart_requester.finalize()
+        watermarks.advance('shot_chart_detail', season_id, game_set)
+
+    # Only the refreshed season's partitions are rewritten.
+    if settings.parquet_dir is not None:
+        ParquetExporter(settings, settings.parquet_dir).export([season_id], skip_tables, quiet)
 
     if quiet:
         print("ok")
+    else:
+        settings.http.print_stats()
+
+    return counts
+
+
+def daemon_mode(settings, skip_tables, quiet, schedule, status_file):
+    """
+    Refreshes the current season on a schedule until stopped, reusing the
+    settings, connections, and requesters between refreshes.
+    """
+
+    requesters = current_season_requesters(settings)
+
+    # Every poll has to see the games played since the last one, not the
+    # first poll's responses until they expire.
+    if settings.response_cache is not None:
+        settings.response_cache.read_mutable = False
+
+    def refresh():
+        try:
+            counts = current_season_mode(settings, skip_tables, quiet, requesters)
+        except Exception:
+            # The next refresh starts on a new connection, its temp tables
+            # are created again.
+            if not settings.db.is_closed():
+                settings.db.close()
+            raise
+        if settings.response_cache is not None:
+            settings.response_cache.prune()
+        return counts
+
+    if not quiet:
+        print("Refreshing the current season in daemon mode, stop with Ctrl-C or SIGTERM.")
+
+    RefreshDaemon(refresh, schedule, status_file, quiet).run()
 
 
 def main(args, from_gui):
@@ -348,8 +652,24 @@ def main(args, from_gui):
             '--current-season-mode' to refresh the last season loaded in an existing database.
         ''')
 
+    if args.daemon and not current_season_mode_set:
+        sys.exit('''
+            Error: option '--daemon' refreshes the current season, pass it with '--current-season-mode'.
+        ''')
+
+    if args.offline_replay and args.response_cache is None:
+        sys.exit('''
+            Error: option '--offline-replay' needs a '--response-cache' directory to replay from.
+        ''')
+
     create_schema = args.create_schema
     request_gap = float(args.request_gap)
+
+    # The request gap is the default budget, unless a rate is passed directly.
+    requests_per_second = args.requests_per_second
+    if requests_per_second is None and request_gap > 0:
+        requests_per_second = 1 / request_gap
+
     seasons = args.seasons
     skip_tables = args.skip_tables
     quiet = args.quiet
@@ -365,46 +685,95 @@ def main(args, from_gui):
         args.database_host,
         args.batch_size,
         args.sqlite_path,
-        args.quiet)
+        args.quiet,
+        args.http_pool_size,
+        requests_per_second,
+        args.request_burst,
+        args.max_in_flight,
+        args.adaptive_rate,
+        args.max_requests_per_second,
+        args.request_timeout,
+        args.request_retries,
+        args.response_cache,
+        args.cache_ttl_hours,
+        args.cache_max_mb,
+        args.offline_replay,
+        args.parallel_stages,
+        args.verify_schema,
+        args.queue_depth,
+        args.sqlite_bulk_load,
+        args.defer_indexes,
+        args.writers,
+        args.duckdb_path,
+        args.parquet_dir,
+        args.partition_seasons,
+        args.shard_by)
 
     if default_mode_set:
-        default_mode(settings, create_schema, request_gap, seasons, skip_tables, quiet or from_gui)
-    if current_season_mode_set:
-        current_season_mode(settings, request_gap, skip_tables, quiet)
-
-def play_by_play_helper(pbp_requester, player_requester, game_list, display_str, quiet, request_gap):
+        default_mode(settings, create_schema, seasons, skip_tables, quiet or from_gui, args.resume,
+                     args.reload_seasons)
+    if current_season_mode_set and args.daemon:
+        schedule = PollSchedule(args.poll_minutes, args.game_night_poll_minutes)
+        daemon_mode(settings, skip_tables, quiet, schedule, StatusFile(args.status_file))
+    elif current_season_mode_set:
+        if settings.response_cache is not None:
+            settings.response_cache.read_mutable = False
+        current_season_mode(settings, skip_tables, quiet)
+
+    if settings.response_cache is not None:
+        settings.response_cache.prune()
+
+def play_by_play_helper(pbp_requester, player_requester, game_list, display_str, settings, quiet,
+                        journal=None, table_name=None):
     """
     Helper function to take care of concurrent fetching and insertion.
+
+    If a `journal` is passed, the game ids of every batch are recorded under
+    `table_name` in the same transaction as the batch's rows.
     """
 
     # Load game dependent data.
     player_id_set = player_requester.get_id_set()
     rows = []
-    game_progress_bar = progress_bar(game_list, prefix=display_str, length=30, quiet=quiet)
+    game_ids = []
+
+    def insert_batch(batch_rows, batch_game_ids):
+        with settings.db.atomic():
+            pbp_requester.insert_batch(batch_rows, player_id_set)
+            if journal is not None:
+                journal.mark_done(table_name, batch_game_ids)
+
+    # Games are fetched several at a time by the fetch engine, bound by the
+    # shared request budget, and come back in completion order.
+    fetch_engine = FetchEngine(settings.max_in_flight, settings.queue_depth)
+    fetched_games = fetch_engine.fetch(pbp_requester.fetch_game, game_list)
+    game_progress_bar = progress_bar(
+        fetched_games,
+        prefix=display_str,
+        length=30,
+        quiet=quiet,
+        total=len(game_list),
+        status=settings.http.describe_rate)
 
     # Okay so this takes a really long time due to rate
     # limiting and over 25K games. Best we can do so
     # far is batch the rows into groups of 100K and insert them
-    # in a different thread.
-    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-        for game_id in game_progress_bar:
-            new_rows = pbp_requester.fetch_game(game_id)
+    # in writer threads. The pipeline owns a batch once it is submitted,
+    # and blocks here when the writers fall behind.
+    with WriterPipeline(insert_batch, settings.queue_depth, settings.writers, settings.db) as pipeline:
+        for game_id, new_rows in game_progress_bar:
             rows += new_rows
+            game_ids.append(game_id)
 
-            if len(rows) > 100000:
-                # We should be good for the race condition here.
-                # It takes a wee bit to insert 100K rows.
-                copy_list = copy.deepcopy(rows)
-                executor.submit(
-                    pbp_requester.insert_batch,
-                    copy_list, player_id_set
-                )
+            if len(rows) > play_by_play_batch_size:
+                pipeline.submit(rows, game_ids)
                 rows = []
-            time.sleep(request_gap)
+                game_ids = []
+
+        if rows or game_ids:
+            print(f"Inserting excess {len(rows)} PlayByPlay/PlayByPlayV3 rows.")
+            pipeline.submit(rows, game_ids)
 
-    if rows:
-        print(f"Inserting excess {len(rows)} PlayByPlay/PlayByPlayV3 rows.")
-        pbp_requester.insert_batch(rows, player_id_set)
 
 # Default non-gui executable.
 if __name__ == "__main__":
@@ -0,0 +1,233 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+Parquet export of the loaded tables.
+
+Every table is written as a Parquet dataset under its own directory. Tables
+with a season are partitioned by it, Hive style:
+
+    <parquet-dir>/player_game_log/season_id=2023/part-0.parquet
+
+A partition is only ever rewritten as a whole, so an export after a current
+season refresh only touches that season. Rows are sorted by game where there
+is one, so the row group statistics let readers skip most of a partition when
+filtering on a game.
+"""
+
+import datetime
+import os
+from itertools import islice
+
+from models import (
+    EventMessageType,
+    Game,
+    PlayByPlay,
+    PlayByPlayV3,
+    Player,
+    PlayerGameLog,
+    PlayerGeneralTraditionalTotal,
+    PlayerSeason,
+    Season,
+    ShotChartDetail,
+    Team
+)
+from utils import progress_bar
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Exported tables, by their --skip-tables name.
+export_models = {
+    'team': Team,
+    'player': Player,
+    'event_message_type': EventMessageType,
+    'season': Season,
+    'game': Game,
+    'player_game_log': PlayerGameLog,
+    'player_season': PlayerSeason,
+    'pgtt': PlayerGeneralTraditionalTotal,
+    'play_by_play': PlayByPlay,
+    'play_by_playv3': PlayByPlayV3,
+    'shot_chart_detail': ShotChartDetail,
+}
+
+# Rows per row group, also the number of rows held in memory at once.
+row_group_size = 100000
+
+partition_column = 'season_id'
+file_name = 'part-0.parquet'
+
+
+class ParquetExporter:
+    """
+    Writes tables from the database to Parquet datasets.
+    """
+
+    def __init__(self, settings, directory):
+        """
+        Constructor.
+        """
+        self.settings = settings
+        self.directory = directory
+        self.settings.db.bind(list(export_models.values()))
+
+    def export(self, season_ids, skip_tables=(), quiet=False):
+        """
+        Rewrite the partitions of `season_ids` of every table, and the tables
+        without a season in full.
+        """
+        models = [
+            model for name, model in export_models.items()
+            if name not in skip_tables and model.table_exists()
+        ]
+
+        export_bar = progress_bar(
+            models,
+            prefix='Exporting Parquet',
+            suffix='',
+            length=30,
+            quiet=quiet)
+
+        for model in export_bar:
+            self.export_table(model, season_ids)
+
+    def export_table(self, model, season_ids):
+        """
+        Write one table.
+        """
+        table_dir = os.path.join(self.directory, model._meta.table_name)
+        meta_fields = model._meta.fields
+        fields = [field for field in model._meta.sorted_fields if field.name != partition_column]
+
+        if partition_column in meta_fields and not meta_fields[partition_column].primary_key:
+            season_field = meta_fields[partition_column]
+            query = model.select(*fields)
+        else:
+            # The season table itself, and tables without a season.
+            fields = model._meta.sorted_fields
+            self.write(model.select(*fields), fields, table_dir)
+            return
+
+        if 'game_id' in meta_fields:
+            query = query.order_by(model.game_id)
+
+        for season_id in season_ids:
+            partition_dir = os.path.join(table_dir, f'{partition_column}={season_id}')
+            self.write(query.where(season_field == season_id), fields, partition_dir)
+
+    def write(self, query, fields, directory):
+        """
+        Stream the rows of the query into `directory`, replacing the file
+        that was there. Nothing is left behind if the query has no rows.
+        """
+        schema, converters = arrow_schema(fields)
+        strings = [field.column_name for field in fields if schema.field(field.column_name).type == pyarrow.string()]
+        path = os.path.join(directory, file_name)
+        rows = query.tuples().iterator()
+
+        writer = None
+        try:
+            while True:
+                chunk = list(islice(rows, row_group_size))
+                if not chunk:
+                    break
+                if writer is None:
+                    os.makedirs(directory, exist_ok=True)
+                    writer = pyarrow.parquet.ParquetWriter(
+                        path + '.tmp',
+                        schema,
+                        use_dictionary=strings,
+                        write_statistics=True)
+                columns = [
+                    pyarrow.array([convert(row[i]) for row in chunk], schema.field(i).type)
+                    for i, convert in enumerate(converters)
+                ]
+                writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        os.replace(path + '.tmp', path)
+
+
+def arrow_schema(fields):
+    """
+    Arrow schema of the fields, and a converter for each of them from the
+    values peewee returns.
+    """
+    columns = []
+    converters = []
+    for field in fields:
+        arrow_type, convert = arrow_types.get(field.field_type, (pyarrow.string(), str))
+        columns.append(pyarrow.field(field.column_name, arrow_type, nullable=field.null))
+        converters.append(nullable(convert))
+    return pyarrow.schema(columns), converters
+
+
+def nullable(convert):
+    """
+    Passes None through a converter.
+    """
+    def wrapper(value):
+        return None if value is None else convert(value)
+    return wrapper
+
+
+def to_date(value):
+    """
+    SQLite returns dates as strings, which may carry a time.
+    """
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(value[:10])
+
+
+def to_datetime(value):
+    """
+    See `to_date`.
+    """
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time())
+    return datetime.datetime.fromisoformat(value)
+
+
+if pyarrow is not None:
+    arrow_types = {
+        'AUTO': (pyarrow.int64(), int),
+        'BIGAUTO': (pyarrow.int64(), int),
+        'BIGINT': (pyarrow.int64(), int),
+        'INT': (pyarrow.int64(), int),
+        'SMALLINT': (pyarrow.int64(), int),
+        'BOOL': (pyarrow.bool_(), bool),
+        'DECIMAL': (pyarrow.float64(), float),
+        'DOUBLE': (pyarrow.float64(), float),
+        'FLOAT': (pyarrow.float64(), float),
+        'DATE': (pyarrow.date32(), to_date),
+        'DATETIME': (pyarrow.timestamp('us'), to_datetime),
+    }
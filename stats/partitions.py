@@ -0,0 +1,165 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+Postgres tables partitioned by season.
+
+With `--partition-seasons`, the largest tables are created on Postgres as
+tables LIST partitioned on `season_id`, with one partition per season added as
+seasons are loaded. Queries filtering on a season only read its partition,
+and a season is emptied for a reload by swapping its partition out instead of
+deleting its rows, see `clear_season`.
+
+Tables that already exist are left as they are.
+"""
+
+from contextlib import contextmanager
+
+from peewee import SQL
+
+from models import PlayByPlay, PlayByPlayV3, PlayerGameLog, ShotChartDetail
+
+partition_column = 'season_id'
+partitioned_models = [PlayerGameLog, PlayByPlay, PlayByPlayV3, ShotChartDetail]
+partitioned_tables = {model._meta.table_name for model in partitioned_models}
+
+
+def is_partitioned(settings, model):
+    """
+    Whether the model's table is created partitioned.
+    """
+    return settings.partition_seasons and model._meta.table_name in partitioned_tables
+
+
+@contextmanager
+def partitioned_table(settings, model):
+    """
+    While active, CREATE TABLE for the model builds it partitioned by season.
+    Postgres wants the partition key in the primary key, so it's added there,
+    and there's no partition for rows without a season, so it's NOT NULL.
+    """
+    if not is_partitioned(settings, model):
+        yield
+        return
+
+    meta = model._meta
+    primary_key = meta.primary_key
+    season_id = meta.fields[partition_column]
+    saved = (meta.table_settings, meta.constraints, season_id.null)
+
+    meta.table_settings = [f'PARTITION BY LIST ("{partition_column}")']
+    # Nullable on the models, so older tables can get the column added.
+    season_id.null = False
+    if meta.composite_key:
+        field_names = primary_key.field_names
+        primary_key.field_names = field_names + (partition_column,)
+    else:
+        primary_key.primary_key = False
+        meta.constraints = list(meta.constraints or []) + [
+            SQL(f'PRIMARY KEY ("{primary_key.column_name}", "{partition_column}")')
+        ]
+
+    try:
+        yield
+    finally:
+        meta.table_settings, meta.constraints, season_id.null = saved
+        if meta.composite_key:
+            primary_key.field_names = field_names
+        else:
+            primary_key.primary_key = True
+
+
+def create_season_partitions(settings, season_ids):
+    """
+    Add the partitions of the seasons to every partitioned table.
+    """
+    for model in partitioned_models:
+        if not table_is_partitioned(settings, model):
+            continue
+        for season_id in season_ids:
+            settings.db.execute_sql(
+                f'CREATE TABLE IF NOT EXISTS "{partition_name(model, season_id)}" '
+                f'PARTITION OF "{model._meta.table_name}" FOR VALUES IN ({int(season_id)})')
+
+
+def clear_season(settings, model, season_id):
+    """
+    Remove the rows of a season from one of the partitioned tables, before
+    loading it again. A partitioned table has the season's partition
+    detached, emptied with TRUNCATE, and attached again, which doesn't go
+    through the rows one by one or leave dead rows to vacuum. Other tables
+    delete the season's rows.
+    """
+    if settings.db_type != 'postgres' or not table_is_partitioned(settings, model):
+        model.delete().where(model.season_id == season_id).execute()
+        return
+
+    if not partition_exists(settings, model, season_id):
+        return
+    name = detach_season(settings, model, season_id)
+    settings.db.execute_sql(f'TRUNCATE TABLE "{name}"')
+    attach_season(settings, model, season_id)
+
+
+def detach_season(settings, model, season_id):
+    """
+    Detach a season's partition from the table. The rows stay in a standalone
+    table named by `partition_name`, which can be dropped, reloaded, or
+    attached again. Returns its name.
+    """
+    name = partition_name(model, season_id)
+    settings.db.execute_sql(f'ALTER TABLE "{model._meta.table_name}" DETACH PARTITION "{name}"')
+    return name
+
+
+def attach_season(settings, model, season_id, table_name=None):
+    """
+    Attach a table as a season's partition. Defaults to the table left by
+    `detach_season`. Every row must be of that season.
+    """
+    name = table_name or partition_name(model, season_id)
+    settings.db.execute_sql(
+        f'ALTER TABLE "{model._meta.table_name}" ATTACH PARTITION "{name}" '
+        f'FOR VALUES IN ({int(season_id)})')
+
+
+def partition_exists(settings, model, season_id):
+    """
+    Whether the season's partition of the table was created.
+    """
+    cursor = settings.db.execute_sql(
+        'SELECT to_regclass(%s) IS NOT NULL', (f'"{partition_name(model, season_id)}"',))
+    return cursor.fetchone()[0]
+
+
+def table_is_partitioned(settings, model):
+    """
+    Whether the model's table exists and is partitioned.
+    """
+    cursor = settings.db.execute_sql(
+        'SELECT 1 FROM pg_partitioned_table p '
+        'JOIN pg_class c ON c.oid = p.partrelid '
+        'WHERE c.relname = %s AND pg_table_is_visible(c.oid)',
+        (model._meta.table_name,))
+    return cursor.fetchone() is not None
+
+
+def partition_name(model, season_id):
+    """
+    e.g. play_by_play_2023.
+    """
+    return f'{model._meta.table_name}_{int(season_id)}'
@@ -0,0 +1,121 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+Bounded hand-off of row batches from the fetching side to writer threads.
+
+Batches are handed over as they are, not copied. Once a batch is submitted
+the producer must not touch it again. The queue is bounded, so when writers
+fall behind `submit` blocks, and the fetching slows down to the speed of the
+database instead of piling rows up in memory.
+"""
+
+import queue
+import threading
+
+
+class WriterPipeline:
+
+    # Tells a writer to exit.
+    done = object()
+
+    def __init__(self, write_fn, queue_depth=2, writers=1, db=None):
+        """
+        Constructor. `write_fn` is called with the arguments of every
+        submitted batch. If `db` is passed, every writer thread gets its own
+        connection for its lifetime.
+        """
+        self.write_fn = write_fn
+        self.queue_depth = max(queue_depth, 1)
+        self.writers = max(writers, 1)
+        self.db = db
+
+        self.batches = queue.Queue(maxsize=self.queue_depth)
+        self.threads = []
+        self.error = None
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        for _ in range(self.writers):
+            thread = threading.Thread(target=self.run_writer, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        # Don't hide the producer's own error behind a writer's.
+        if exc_type is None:
+            self.raise_error()
+
+    def submit(self, *args):
+        """
+        Hand a batch to the writers. Blocks while the queue is full.
+        """
+        self.raise_error()
+        self.batches.put(args)
+
+    def close(self):
+        """
+        Wait for the queued batches to be written and stop the writers.
+        """
+        for _ in self.threads:
+            self.batches.put(self.done)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def raise_error(self):
+        """
+        Raise the first error a writer ran into, if any.
+        """
+        with self.lock:
+            error = self.error
+        if error is not None:
+            raise error
+
+    def run_writer(self):
+        """
+        Writer thread.
+        """
+        if self.db is None:
+            self.write_batches()
+        else:
+            with self.db.connection_context():
+                self.write_batches()
+
+    def write_batches(self):
+        """
+        Write batches until told to stop. After a failure, batches are still
+        taken off the queue so the producer is never stuck on a full queue.
+        """
+        while True:
+            batch = self.batches.get()
+            if batch is self.done:
+                return
+
+            with self.lock:
+                failed = self.error is not None
+            if failed:
+                continue
+
+            try:
+                self.write_fn(*batch)
+            except BaseException as e:
+                with self.lock:
+                    if self.error is None:
+                        self.error = e
@@ -19,12 +19,11 @@ limitations under the License.
 PlayByPlay object requester and builder.
 """
 
-import requests
 import urllib.parse
 
 from models import PlayByPlay
-from constants import headers
-from db_utils import insert_many
+from db_utils import create_tables, insert_many, add_season_column
+from utils import game_id_to_season_int
 
 
 class PlayByPlayRequester:
@@ -34,12 +33,13 @@ class PlayByPlayRequester:
     def __init__(self, settings):
         self.settings = settings
         self.settings.db.bind([PlayByPlay])
+        add_season_column(self.settings, PlayByPlay)
 
     def create_ddl(self):
         """
         Initialize the table schema.
         """
-        self.settings.db.create_tables([PlayByPlay], safe=True)
+        create_tables(self.settings, [PlayByPlay])
 
     def fetch_game(self, game_id):
         """
@@ -51,17 +51,19 @@ class PlayByPlayRequester:
         # Encode without safe '+', apparently the NBA likes unsafe url params.
         params_str = urllib.parse.urlencode(params, safe=':+')
 
-        response = requests.get(url=self.url, headers=headers, params=params_str).json()
+        response = self.settings.http.get_json(self.url, params_str)
 
         # pulling just the data we want
         player_info = response['resultSets'][0]['rowSet']
 
         rows = []
+        season_id = game_id_to_season_int(game_id)
 
         # looping over data to return.
         for row in player_info:
             new_row = {
                 'game_id': row[0],
+                'season_id': season_id,
                 'event_num': row[1],
                 'event_msg_type': row[2],
                 'event_msg_action_type': row[3],
@@ -21,12 +21,11 @@ PlayByPlayV3 object requester and builder.
 This has a simpler schema than PlayByPlay
 """
 
-import requests
 import urllib.parse
 
 from models import PlayByPlayV3
-from constants import headers
-from db_utils import insert_many
+from db_utils import create_tables, insert_many, add_season_column
+from utils import game_id_to_season_int
 
 
 class PlayByPlayV3Requester:
@@ -36,12 +35,13 @@ class PlayByPlayV3Requester:
     def __init__(self, settings):
         self.settings = settings
         self.settings.db.bind([PlayByPlayV3])
+        add_season_column(self.settings, PlayByPlayV3)
 
     def create_ddl(self):
         """
         Initialize the table schema.
         """
-        self.settings.db.create_tables([PlayByPlayV3], safe=True)
+        create_tables(self.settings, [PlayByPlayV3])
 
     def fetch_game(self, game_id):
         """
@@ -53,18 +53,20 @@ class PlayByPlayV3Requester:
         # Encode without safe '+', apparently the NBA likes unsafe url params.
         params_str = urllib.parse.urlencode(params, safe=':+')
 
-        response = requests.get(url=self.url, headers=headers, params=params_str).json()
+        response = self.settings.http.get_json(self.url, params_str)
 
         # pulling just the data we want
         player_info = response['game']['actions']
         game_id = response['game']['gameId']
 
         rows = []
+        season_id = game_id_to_season_int(game_id)
 
         # looping over data to return.
         for row in player_info:
             new_row = {
                 'game_id': game_id,
+                'season_id': season_id,
                 'action_number': row['actionNumber'],
                 'clock': row['clock'],
                 'period': row['period'],
@@ -31,6 +31,9 @@ class PlayerRequester(GenericRequester):
     per_mode = 'Totals'
     player_info_url = 'http://stats.nba.com/stats/leaguedashplayerbiostats'
 
+    # Same requests as the PlayerSeasonRequester.
+    shared_responses = True
+
     def __init__(self, settings):
         """
         Constructor. Pass on all relevant vars.
@@ -41,10 +44,8 @@ class PlayerRequester(GenericRequester):
         """
         Gets a set of ids for caching.
         """
-        s = set()
-        for player in Player.select(Player.player_id):
-            s.add(player.player_id)
-        return s
+        query = Player.select(Player.player_id).tuples()
+        return set(player_id for (player_id,) in query)
 
     def generate_rows(self, season_id):
         """
@@ -61,7 +62,7 @@ class PlayerRequester(GenericRequester):
         Store collected rows. Custom implementation for the on_conflict_ignore
         argument.
         """
-        insert_many_on_conflict_ignore(self.settings, Player, self.rows)
+        insert_many_on_conflict_ignore(self.settings, Player, self.rows, self.insert_fields())
 
     def build_params(self, season_id):
         """
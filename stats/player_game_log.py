@@ -20,15 +20,19 @@ PlayerGameLog requester and builder. Also takes care of the Game table. See
 class-level docstring.
 """
 
-import requests
 import urllib.parse
+from datetime import date
+
+import requests
+from peewee import fn
 
-from db_utils import insert_many
-from utils import get_rowset_mapping, column_names_from_table, season_id_to_int
-from models import PlayerGameLog, PlayerGameLogTemp
+from db_utils import insert_many, merge_staged
+from utils import date_param, date_shards, get_rowset_mapping, season_id_to_int, season_window
+from models import Game, PlayerGameLog, PlayerGameLogTemp
 from game import GameEntry
+from id_sets import IdTuples
 from general_requester import GenericRequester
-from constants import headers
+from fetch_engine import FetchEngine
 
 
 class PlayerGameLogRequester(GenericRequester):
@@ -42,17 +46,39 @@ class PlayerGameLogRequester(GenericRequester):
     """
 
     url = 'https://stats.nba.com/stats/playergamelogs'
-    game_set = set()
 
     def __init__(self, settings):
         """
         Constructor.
         """
         super().__init__(settings, self.url, PlayerGameLog)
+        self.game_set = set()
         # TODO: this conflicts with a fresh db.
-        self.settings.db.bind([PlayerGameLogTemp])
+        self.settings.db.bind([PlayerGameLogTemp, Game])
+        self.create_temp_table()
+
+    def create_temp_table(self):
+        """
+        The temp table only exists on the connection that created it.
+        """
         self.settings.db.create_tables([PlayerGameLogTemp], safe=True)
 
+    def clear(self):
+        """
+        Forget the fetched rows and games, once they are loaded.
+        """
+        self.rows = []
+        self.game_set = set()
+
+    def reset(self):
+        """
+        Forget the rows and games of a previous refresh, so the requester can
+        be reused for the next one.
+        """
+        self.clear()
+        self.create_temp_table()
+        PlayerGameLogTemp.delete().execute()
+
     def create_ddl(self):
         """
         Override method to setup temp table.
@@ -63,7 +89,7 @@ class PlayerGameLogRequester(GenericRequester):
         """
         Bulk insert.
         """
-        insert_many(self.settings, PlayerGameLogTemp, self.rows)
+        insert_many(self.settings, PlayerGameLogTemp, self.rows, self.insert_fields())
         # TODO: should set rows to []?
 
     def get_game_set(self):
@@ -84,58 +110,152 @@ class PlayerGameLogRequester(GenericRequester):
         """
         self.game_set = set_new
 
-    def get_team_player_id_set(self, temp_table=False):
+    def fetch_season_game_id_set(self, season_id):
         """
-        Returns a set of team id and player ids, used for the shot_chart_detail api.
+        Returns the ids of the games in the player_game_log table for a
+        season, formatted like GameBuilder.fetch_season_game_id_set.
         """
-        s = set()
-
-        if temp_table:
-            table = PlayerGameLogTemp
-        else:
-            table = PlayerGameLog
+        query = (PlayerGameLog
+                 .select(PlayerGameLog.game_id)
+                 .where(PlayerGameLog.season_id == season_id)
+                 .distinct()
+                 .tuples())
+        return set([str(game_id).zfill(10) for (game_id,) in query])
+
+    def get_team_player_id_set(self, season_ids):
+        """
+        Returns the team id, player id, and season tuples in the passed
+        seasons, used for the shot_chart_detail api.
+        """
+        tid = PlayerGameLog.team_id
+        pid = PlayerGameLog.player_id
+        sid = PlayerGameLog.season_id
+
+        query = (PlayerGameLog
+                 .select(tid, pid, sid)
+                 .where(sid.in_(season_ids))
+                 .group_by(tid, pid, sid)
+                 .tuples())
+        # NBA team and player ids fit in 32 bits.
+        return IdTuples(3, query, 'i')
+
+    def get_team_player_id_set_for_games(self, game_ids):
+        """
+        Returns a dict of the team id, player id, and season tuples that
+        played in the passed games, from the fetched rows, to the date of
+        their first game. Used to refresh shot_chart_detail.
+        """
+        game_dates = {entry.game_id: entry.game_date for entry in self.game_set}
+        fields = self.insert_fields()
+        tid = fields.index('team_id')
+        pid = fields.index('player_id')
+        gid = fields.index('game_id')
+        sid = fields.index('season_id')
+
+        first_games = {}
+        for row in self.rows:
+            if row[gid] not in game_ids:
+                continue
+            key = (row[tid], row[pid], row[sid])
+            game_date = game_dates[row[gid]]
+            if key not in first_games or game_date < first_games[key]:
+                first_games[key] = game_date
+
+        return first_games
+
+    def fetch_season(self, season_id, playoff_games, date_from=None):
+        """
+        Build GET REST request to the NBA for a season,
+        iterate over the results, store in the database.
 
-        tid = table.team_id
-        pid = table.player_id
+        `playoff_games` is a boolean used to load regular or playoff games.
+        With `date_from`, only the games played since then are requested.
 
-        for player_game_log in table.select(tid, pid).group_by(tid, pid):
-            s.add((player_game_log.team_id, player_game_log.player_id))
+        With `settings.shard_by`, the season is requested in month or week
+        long date ranges instead of one large response, only over the months
+        games of that type are played. The shards are fetched several at a
+        time, and a malformed or empty shard is retried on its own.
+        """
+        season_int = season_id_to_int(season_id)
 
-        return s
+        if self.settings.shard_by is None:
+            result_sets = self.fetch_shard(season_id, playoff_games, date_from)
+            self.add_rows(result_sets, season_int, playoff_games)
+            return
 
-    def temp_table_except_predicate(self):
-        """
-        This runs an EXCEPT between the temp table and the non-temp table to find
-        the new games.
-        """
-        regular_query = PlayerGameLog.select(PlayerGameLog.game_id)
-        temp_query = PlayerGameLogTemp.select(PlayerGameLogTemp.game_id)
+        def fetch_shard(shard):
+            return self.fetch_shard_with_retry(season_id, playoff_games, *shard)
 
-        expt = temp_query - regular_query
+        first, last = self.season_dates(season_int, playoff_games)
+        if date_from is not None:
+            first = max(first, date.fromisoformat(str(date_from)[:10]))
 
-        return expt.select_from(expt.c.game_id)
+        shards = date_shards(first, last, self.settings.shard_by)
+        fetch_engine = FetchEngine(self.settings.max_in_flight)
+        for shard, result_sets in fetch_engine.fetch(fetch_shard, shards):
+            self.add_rows(result_sets, season_int, playoff_games)
 
-    def fetch_season(self, season_id, playoff_games):
+    def season_dates(self, season_int, playoff_games):
         """
-        Build GET REST request to the NBA for a season,
-        iterate over the results, store in the database.
-
-        `playoff_games` is a boolean used to load regular or playoff games.
+        First and last day to request the regular season or playoff games of a
+        season for. The games already in the game table narrow the start, and
+        extend the end if they were played after it.
+        """
+        first, last = season_window(season_int, playoff_games)
+
+        known_first, known_last = (
+            Game
+            .select(fn.MIN(Game.date), fn.MAX(Game.date))
+            .where((Game.season_id == season_int) & (Game.playoff_game == playoff_games))
+            .tuples()
+            .get()
+        )
+        if known_first is None:
+            return first, last
+        return (
+            date.fromisoformat(str(known_first)[:10]),
+            max(last, date.fromisoformat(str(known_last)[:10])),
+        )
+
+    def fetch_shard(self, season_id, playoff_games, date_from=None, date_to=None):
+        """
+        Request the games of a season, between optional dates. Returns the
+        result set.
         """
-        params = self.build_params(season_id, playoff_games)
+        params = self.build_params(season_id, playoff_games, date_from, date_to)
 
         # Encode without safe '+', apparently the NBA likes unsafe url params.
         params_str = urllib.parse.urlencode(params, safe=':+')
 
-        response = requests.get(url=self.url, headers=headers, params=params_str).json()
+        response = self.settings.http.get_json(self.url, params_str)
+        return response['resultSets'][0]
 
-        result_sets = response['resultSets'][0]
+    def fetch_shard_with_retry(self, season_id, playoff_games, date_from, date_to):
+        """
+        `fetch_shard`, also retrying malformed responses. The HTTP client
+        already retried everything else, so its errors are raised as they are.
+        """
+        http = self.settings.http
+        for attempt in range(http.retries + 1):
+            try:
+                return self.fetch_shard(season_id, playoff_games, date_from, date_to)
+            except requests.RequestException as error:
+                # A body that isn't JSON is both a RequestException and a ValueError.
+                if not isinstance(error, requests.JSONDecodeError) or attempt == http.retries:
+                    raise
+            except (ValueError, LookupError):
+                if attempt == http.retries:
+                    raise
+            http.backoff(attempt)
+
+    def add_rows(self, result_sets, season_int, playoff_games):
+        """
+        Store the rows of a result set, and collect its games.
+        """
         rowset = result_sets['rowSet']
 
-        season_int = season_id_to_int(season_id)
-        column_names = column_names_from_table(self.settings.db, self.table._meta.table_name)
-
-        column_mapping = get_rowset_mapping(result_sets, column_names)
+        project = self.settings.schema.projector(self.table, result_sets)
+        season_suffix = (season_int,)
 
         rowset_mapping = get_rowset_mapping(result_sets, self.local_resultset_rows())
 
@@ -166,11 +286,15 @@ class PlayerGameLogRequester(GenericRequester):
                         playoff_game=playoff_games,
                         loser=loser))
 
-            new_row = {column_name: row[row_index] for column_name, row_index in column_mapping.items()}
-            new_row['season_id'] = season_int
-            self.rows.append(new_row)
+            self.rows.append(project(row) + season_suffix)
 
-    def build_params(self, season_id, playoff_games):
+    def insert_fields(self):
+        """
+        Fields of the tuples in `self.rows`, the season is added last.
+        """
+        return super().insert_fields() + ['season_id']
+
+    def build_params(self, season_id, playoff_games, date_from=None, date_to=None):
         """
         Create required parameters dict for the request.
         """
@@ -178,8 +302,8 @@ class PlayerGameLogRequester(GenericRequester):
         if playoff_games:
             season_type = 'Playoffs'
         return {
-            'DateFrom': '',
-            'DateTo': '',
+            'DateFrom': date_param(date_from) if date_from is not None else '',
+            'DateTo': date_param(date_to) if date_to is not None else '',
             'GameSegment': '',
             'LastNGames': '',
             'LeagueID': '00',
@@ -218,46 +342,8 @@ class PlayerGameLogRequester(GenericRequester):
         """
         Inserts values from the temp table into the regular table that don't exist
         in the regular table already.
+        """
+        fields = PlayerGameLog._meta.sorted_fields
+        query = PlayerGameLogTemp.select(*[getattr(PlayerGameLogTemp, field.name) for field in fields])
 
-        THERE HAS TO BE A BETTER WAY OF DEFINING ALL FIELDS.
-        """
-        predicate = PlayerGameLog.select(PlayerGameLog.game_id)
-
-        (PlayerGameLog.insert_from(
-            PlayerGameLogTemp
-            .select()
-            .where(PlayerGameLogTemp.game_id.not_in(predicate)),
-
-            fields=[
-                PlayerGameLog.player_id,
-                PlayerGameLog.game_id,
-                PlayerGameLog.team_id,
-                PlayerGameLog.season_id,
-                PlayerGameLog.wl,
-                PlayerGameLog.min,
-                PlayerGameLog.fgm,
-                PlayerGameLog.fga,
-                PlayerGameLog.fg_pct,
-                PlayerGameLog.fg3m,
-                PlayerGameLog.fg3a,
-                PlayerGameLog.fg3_pct,
-                PlayerGameLog.ftm,
-                PlayerGameLog.fta,
-                PlayerGameLog.ft_pct,
-                PlayerGameLog.oreb,
-                PlayerGameLog.dreb,
-                PlayerGameLog.reb,
-                PlayerGameLog.ast,
-                PlayerGameLog.tov,
-                PlayerGameLog.stl,
-                PlayerGameLog.blk,
-                PlayerGameLog.blka,
-                PlayerGameLog.pf,
-                PlayerGameLog.pfd,
-                PlayerGameLog.pts,
-                PlayerGameLog.plus_minus,
-                PlayerGameLog.nba_fantasy_pts,
-                PlayerGameLog.dd2,
-                PlayerGameLog.td3
-            ]
-        )).execute()
+        merge_staged(self.settings, PlayerGameLog, query, fields, key=['player_id', 'game_id'])
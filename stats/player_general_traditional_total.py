@@ -19,13 +19,11 @@ limitations under the License.
 PlayerGeneralTraditionalTotal builder and requester.
 """
 
-import requests
 import urllib.parse
 
-from utils import get_rowset_mapping, column_names_from_table, season_id_to_int
+from utils import season_id_to_int
 from models import PlayerGeneralTraditionalTotal
 from general_requester import GenericRequester
-from constants import headers
 
 
 class PlayerGeneralTraditionalTotalRequester(GenericRequester):
@@ -44,6 +42,14 @@ class PlayerGeneralTraditionalTotalRequester(GenericRequester):
         """
         Build GET REST request to the NBA for a season.
         Also populate this table.
+        """
+        self.fetch_season(season_id)
+        super().populate()
+
+    def fetch_season(self, season_id):
+        """
+        Build GET REST request to the NBA for a season and collect the rows,
+        without storing them.
         We cannot rely on the base table's generic method, due to the `season_id` field.
         """
         params = self.build_params(season_id)
@@ -52,29 +58,22 @@ class PlayerGeneralTraditionalTotalRequester(GenericRequester):
         params_str = urllib.parse.urlencode(params, safe=':+')
 
         # json response
-        response = requests.get(url=self.url, headers=headers, params=params_str).json()
+        response = self.settings.http.get_json(self.url, params_str)
 
         result_sets = response['resultSets'][0]
         rowset = result_sets['rowSet']
 
-        column_names = column_names_from_table(self.settings.db, self.table._meta.table_name)
+        project = self.settings.schema.projector(self.table, result_sets)
 
-        column_mapping = get_rowset_mapping(result_sets, column_names)
-
-        season_id_int = season_id_to_int(season_id)
+        season_suffix = (season_id_to_int(season_id),)
         for row in rowset:
-            new_row = {}
-            for column_name, row_index in column_mapping.items():
-                # None here represents a column that exists in the DB object but
-                # not as a row in the response. See: [#97]
-                if row_index is None:
-                    new_row[column_name] = None
-                else:
-                    new_row[column_name] = row[row_index]
-            new_row['season_id'] = season_id_int
-            self.rows.append(new_row)
+            self.rows.append(project(row) + season_suffix)
 
-        super().populate()
+    def insert_fields(self):
+        """
+        Fields of the tuples in `self.rows`, the season is added last.
+        """
+        return super().insert_fields() + ['season_id']
 
     def build_params(self, season_id):
         """
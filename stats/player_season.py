@@ -19,13 +19,11 @@ limitations under the License.
 PlayerSeason requester and builder.
 """
 
-import requests
 import urllib.parse
 
-from utils import get_rowset_mapping, column_names_from_table, season_id_to_int
+from utils import season_id_to_int
 from models import PlayerSeason
 from general_requester import GenericRequester
-from constants import headers
 
 
 class PlayerSeasonRequester(GenericRequester):
@@ -33,6 +31,9 @@ class PlayerSeasonRequester(GenericRequester):
     per_mode = 'Totals'
     player_info_url = 'http://stats.nba.com/stats/leaguedashplayerbiostats'
 
+    # Same requests as the PlayerRequester.
+    shared_responses = True
+
     def __init__(self, settings):
         """
         Constructor. Attach settings internally and bind the model to the
@@ -44,6 +45,14 @@ class PlayerSeasonRequester(GenericRequester):
         """
         Build GET REST request to the NBA for a season, iterate over the
         results, store in the database.
+        """
+        self.fetch_season(season_id)
+        super().populate()
+
+    def fetch_season(self, season_id):
+        """
+        Build GET REST request to the NBA for a season and collect the rows,
+        without storing them.
         We cannot rely on the base table's generic method, due to the `season_id` field.
         """
         params = self.build_params(season_id)
@@ -52,22 +61,22 @@ class PlayerSeasonRequester(GenericRequester):
         params_str = urllib.parse.urlencode(params, safe=':+')
 
         # json response
-        response = requests.get(url=self.url, headers=headers, params=params_str).json()
+        response = self.settings.http.get_json(self.url, params_str, self.shared_responses)
 
         result_sets = response['resultSets'][0]
         rowset = result_sets['rowSet']
 
-        column_names = column_names_from_table(self.settings.db, self.table._meta.table_name)
+        project = self.settings.schema.projector(self.table, result_sets)
 
-        column_mapping = get_rowset_mapping(result_sets, column_names)
-
-        season_id_int = season_id_to_int(season_id)
+        season_suffix = (season_id_to_int(season_id),)
         for row in rowset:
-            new_row = {column_name: row[row_index] for column_name, row_index in column_mapping.items()}
-            new_row['season_id'] = season_id_int
-            self.rows.append(new_row)
+            self.rows.append(project(row) + season_suffix)
 
-        super().populate()
+    def insert_fields(self):
+        """
+        Fields of the tuples in `self.rows`, the season is added last.
+        """
+        return super().insert_fields() + ['season_id']
 
     def build_params(self, season_id):
         """
@@ -0,0 +1,85 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+Progress journal, used to resume a load that died part way through.
+
+Every unit of work (a season of player_game_log, a game of play_by_play, a
+team / player pair of shot_chart_detail, etc.) is recorded in the same
+transaction that commits its rows. A resumed load skips the recorded units.
+"""
+
+from models import LoadJournal
+
+from db_utils import create_tables, insert_many_on_conflict_ignore
+from utils import chunk_list
+
+
+class ProgressJournal:
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.settings.db.bind([LoadJournal])
+
+    def create_ddl(self):
+        """
+        Creates the load_journal table.
+        """
+        create_tables(self.settings, [LoadJournal])
+
+    def completed_units(self, table_name):
+        """
+        Returns the set of units already loaded into a table.
+        """
+        query = (LoadJournal
+                 .select(LoadJournal.unit)
+                 .where(LoadJournal.table_name == table_name))
+        return set([entry.unit for entry in query])
+
+    def is_done(self, table_name, unit='all'):
+        """
+        Whether a single unit was already loaded.
+        """
+        return (LoadJournal
+                .select()
+                .where((LoadJournal.table_name == table_name) & (LoadJournal.unit == str(unit)))
+                .exists())
+
+    def mark_done(self, table_name, units=('all',)):
+        """
+        Record units as loaded. Call inside the transaction that inserts their
+        rows, so the journal never gets ahead of the data.
+        """
+        rows = [{'table_name': table_name, 'unit': str(unit)} for unit in units]
+        insert_many_on_conflict_ignore(self.settings, LoadJournal, rows)
+
+    def forget(self, table_name, units):
+        """
+        Forget units of a table, so they are loaded again.
+        """
+        # In chunks, a season of games is more than SQLite binds at once.
+        for chunk in chunk_list([str(unit) for unit in units], 500):
+            (LoadJournal
+             .delete()
+             .where((LoadJournal.table_name == table_name) & (LoadJournal.unit.in_(chunk)))
+             .execute())
+
+    def clear(self):
+        """
+        Forget all recorded units, for a fresh load.
+        """
+        LoadJournal.delete().execute()
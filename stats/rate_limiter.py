@@ -0,0 +1,129 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+Request rate limiting for the NBA API.
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket. Tokens refill at `rate` per second, up to
+    `burst` tokens. Every request takes one token, blocking until one is
+    available.
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        Constructor.
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available, then take it.
+        """
+        while True:
+            with self.lock:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def refill(self):
+        """
+        Add the tokens accrued since the last refill. Caller holds the lock.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate):
+        """
+        Change the refill rate. Tokens accrued so far are kept.
+        """
+        with self.lock:
+            self.refill()
+            self.rate = rate
+
+    def describe(self):
+        """
+        Short string of the current rate, for progress output.
+        """
+        return f"{self.rate:.2f} req/s"
+
+
+class AdaptiveRateController:
+    """
+    Additive increase, multiplicative decrease (AIMD) on a token bucket.
+
+    Every `window` healthy responses in a row raise the rate by `increase`
+    requests per second. A throttled or failed response multiplies the rate
+    by `decrease`. Requests that were already in flight tend to fail
+    together, so the rate is only cut once per `cooldown` seconds.
+    """
+
+    def __init__(self, bucket, min_rate, max_rate,
+                 increase=0.1, decrease=0.5, window=10, cooldown=5.0):
+        """
+        Constructor.
+        """
+        self.bucket = bucket
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.cooldown = cooldown
+
+        self.successes = 0
+        self.last_decrease = 0.0
+        self.lock = threading.Lock()
+
+    def record_success(self):
+        """
+        A healthy response came back.
+        """
+        with self.lock:
+            self.successes += 1
+            if self.successes < self.window:
+                return
+            self.successes = 0
+            rate = min(self.bucket.rate + self.increase, self.max_rate)
+        self.bucket.set_rate(rate)
+
+    def record_failure(self):
+        """
+        A throttled, failed, or timed out response came back.
+        """
+        with self.lock:
+            self.successes = 0
+            now = time.monotonic()
+            if now - self.last_decrease < self.cooldown:
+                return
+            self.last_decrease = now
+            rate = max(self.bucket.rate * self.decrease, self.min_rate)
+        self.bucket.set_rate(rate)
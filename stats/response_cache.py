@@ -0,0 +1,194 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+On disk cache of NBA API responses, so rebuilding a database does not have to
+download everything again.
+
+Entries are gzipped JSON files named by the sha256 of the url and the encoded
+request params. Responses for past seasons never change, so they are stored
+as immutable and never expire. Everything else expires after the TTL, and
+isn't read at all by runs refreshing the current season. When the cache grows
+past its size limit, the least recently used entries are removed.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from utils import generate_valid_seasons, season_id_to_int
+
+
+class CacheMissError(Exception):
+    """
+    Raised in offline replay mode when a response is not in the cache.
+    """
+    pass
+
+
+class ResponseCache:
+
+    def __init__(self, path, ttl, max_bytes, offline=False):
+        """
+        Constructor. `ttl` is in seconds and only applies to mutable entries.
+        If `offline` is set, the network is never used, so entries never
+        expire and a cache miss is an error.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        # Refreshes ask for the games played since the last one, with the
+        # same params each time until new games are loaded, so a cached
+        # mutable entry would hide them. Only replaying reads those then.
+        self.read_mutable = True
+        self.current_season = season_id_to_int(generate_valid_seasons()[-1])
+
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def key(self, url, params):
+        """
+        Content address of a request.
+        """
+        if not isinstance(params, str):
+            params = urllib.parse.urlencode(params, safe=':+')
+        return hashlib.sha256(f"{url}?{params}".encode('utf-8')).hexdigest()
+
+    def entry_path(self, key, immutable):
+        """
+        Path of an entry. Entries are fanned out by the first two hex chars.
+        """
+        kind = 'immutable' if immutable else 'mutable'
+        return os.path.join(self.path, kind, key[:2], f"{key}.json.gz")
+
+    def is_immutable(self, params):
+        """
+        A response is immutable if it is for a season that is over. The season
+        comes from the `Season` param, or from the `GameId` for game level
+        endpoints.
+        """
+        if isinstance(params, str):
+            params = dict(urllib.parse.parse_qsl(params, keep_blank_values=True))
+
+        season = params.get('Season')
+        if season:
+            return season_id_to_int(season) < self.current_season
+
+        game_id = str(params.get('GameId') or '')
+        if len(game_id) == 10:
+            # Game ids look like 00SYY00000, YY being the season start year.
+            year = int(game_id[3:5])
+            year += 1900 if year >= 46 else 2000
+            return year < self.current_season
+
+        return False
+
+    def expired(self, path, now):
+        """
+        Whether a mutable entry is past its TTL.
+        """
+        return not self.offline and now - os.path.getmtime(path) > self.ttl
+
+    def get(self, url, params):
+        """
+        Returns the cached body for a request, or None.
+        """
+        key = self.key(url, params)
+        now = time.time()
+
+        path = self.entry_path(key, True)
+        if not os.path.exists(path):
+            path = self.entry_path(key, False)
+            skip = not self.read_mutable and not self.offline
+            if skip or not os.path.exists(path) or self.expired(path, now):
+                with self.lock:
+                    self.misses += 1
+                return None
+
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                body = json.load(f)
+        except (OSError, ValueError):
+            # Truncated or corrupt entry, treat it as a miss.
+            with self.lock:
+                self.misses += 1
+            return None
+
+        # Access time drives LRU eviction, mtime stays the write time for the TTL.
+        os.utime(path, (now, os.path.getmtime(path)))
+        with self.lock:
+            self.hits += 1
+        return body
+
+    def put(self, url, params, body):
+        """
+        Store a response. Written to a temp file first, so a crash can't leave
+        a half written entry behind.
+        """
+        key = self.key(url, params)
+        path = self.entry_path(key, self.is_immutable(params))
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                f.write(json.dumps(body, separators=(',', ':')).encode('utf-8'))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def prune(self):
+        """
+        Remove expired mutable entries, then the least recently used entries
+        until the cache fits in `max_bytes`.
+        """
+        now = time.time()
+        entries = []
+        total = 0
+
+        for kind in ['immutable', 'mutable']:
+            for root, _, files in os.walk(os.path.join(self.path, kind)):
+                for name in files:
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    if kind == 'mutable' and self.expired(path, now):
+                        os.remove(path)
+                        continue
+                    entries.append((stat.st_atime, stat.st_size, path))
+                    total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def print_stats(self):
+        """
+        Print hit and miss counts.
+        """
+        print(f"Response cache: {self.hits} hits, {self.misses} misses.")
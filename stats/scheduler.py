@@ -0,0 +1,119 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+Dependency graph scheduler for the load stages.
+
+Each stage declares the stages it needs to run first. Stages whose
+prerequisites are done run in parallel, up to a limit. All of them share the
+request budget of the HTTP client, so running more stages at once uses the
+budget better instead of making more requests.
+"""
+
+import concurrent.futures
+
+
+class Stage:
+
+    def __init__(self, name, fn, requires=()):
+        """
+        Constructor. `fn` takes no arguments, `requires` is a list of stage
+        names.
+        """
+        self.name = name
+        self.fn = fn
+        self.requires = list(requires)
+
+
+class StageScheduler:
+
+    def __init__(self, max_parallel=1, db=None):
+        """
+        Constructor. If `db` is passed, stages run on worker threads are
+        given their own connection, closed once the stage is done.
+        """
+        self.max_parallel = max(max_parallel, 1)
+        self.db = db
+
+    def run(self, stages):
+        """
+        Run every stage once its prerequisites are done. Ready stages start
+        in the order they were declared. The first failure stops new stages
+        from starting and is raised once the running ones finish.
+        """
+        self.validate(stages)
+
+        if self.max_parallel == 1:
+            # Nothing overlaps, so skip the threads. Declaration order is
+            # already a valid order, see `validate`.
+            for stage in stages:
+                stage.fn()
+            return
+
+        done = set()
+        pending = list(stages)
+        running = {}
+        error = None
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_parallel) as executor:
+            while pending or running:
+                if error is None:
+                    for stage in list(pending):
+                        if len(running) >= self.max_parallel:
+                            break
+                        if all(name in done for name in stage.requires):
+                            pending.remove(stage)
+                            running[executor.submit(self.run_stage, stage)] = stage
+
+                if not running:
+                    break
+
+                finished, _ = concurrent.futures.wait(
+                    running,
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in finished:
+                    stage = running.pop(future)
+                    if future.exception() is not None:
+                        if error is None:
+                            error = future.exception()
+                    else:
+                        done.add(stage.name)
+
+        if error is not None:
+            raise error
+
+    def run_stage(self, stage):
+        """
+        Run a single stage on a worker thread.
+        """
+        if self.db is None:
+            return stage.fn()
+        with self.db.connection_context():
+            return stage.fn()
+
+    def validate(self, stages):
+        """
+        Every prerequisite has to be declared before the stage that needs it.
+        This also rules out cycles.
+        """
+        seen = set()
+        for stage in stages:
+            for name in stage.requires:
+                if name not in seen:
+                    raise ValueError(f"Stage '{stage.name}' requires '{name}', which is not declared before it.")
+            seen.add(stage.name)
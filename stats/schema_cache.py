@@ -0,0 +1,139 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+Table schema cache. Column lists come from the peewee models instead of
+asking the database for them on every request, and the projection of a
+response's rows onto those columns is only built once per table.
+"""
+
+import threading
+from operator import itemgetter
+
+from utils import get_rowset_mapping
+
+
+class SchemaMismatchError(Exception):
+    """
+    Raised when schema verification finds a table that doesn't match its model.
+    """
+    pass
+
+
+class SchemaCache:
+
+    # Not returned by any NBA endpoint. season_id is our construct, and id is
+    # autogenerated.
+    excluded_columns = {'id', 'season_id'}
+
+    def __init__(self, db, verify=False):
+        """
+        Constructor. If `verify` is set, the first lookup of every table
+        checks the model against the columns the database reports.
+        """
+        self.db = db
+        self.verify = verify
+        self.columns = {}
+        self.projectors = {}
+        self.lock = threading.Lock()
+
+    def fields(self, model):
+        """
+        Returns the fields of a model that are filled from the NBA API, in
+        field order.
+        """
+        table_name = model._meta.table_name
+        with self.lock:
+            fields = self.columns.get(table_name)
+        if fields is not None:
+            return fields
+
+        fields = [
+            field
+            for field in model._meta.sorted_fields
+            if field.column_name not in self.excluded_columns
+        ]
+
+        if self.verify:
+            self.verify_table(model)
+
+        with self.lock:
+            self.columns[table_name] = fields
+        return fields
+
+    def column_names(self, model):
+        """
+        Returns the column names of a model's table that are filled from the
+        NBA API, in field order.
+        """
+        return [field.column_name for field in self.fields(model)]
+
+    def field_names(self, model):
+        """
+        Field names matching the tuples built by `projector`, to pass to the
+        insert. Names are used so the same list works for the temp tables.
+        """
+        return [field.name for field in self.fields(model)]
+
+    def projector(self, model, result_sets):
+        """
+        Returns a function that turns a row of the response into a tuple of
+        the model's values, in `field_names` order. Responses of an endpoint
+        almost always share the same headers, so it is cached on them.
+        """
+        key = (model._meta.table_name, tuple(result_sets['headers']))
+        with self.lock:
+            project = self.projectors.get(key)
+        if project is not None:
+            return project
+
+        mapping = get_rowset_mapping(result_sets, self.column_names(model))
+        indexes = list(mapping.values())
+
+        if None in indexes:
+            # None here represents a column that exists in the DB object but
+            # not as a row in the response. See: [#97]
+            def project(row):
+                return tuple(None if index is None else row[index] for index in indexes)
+        elif len(indexes) == 1:
+            # itemgetter with a single index returns the value, not a tuple.
+            index = indexes[0]
+
+            def project(row):
+                return (row[index],)
+        else:
+            project = itemgetter(*indexes)
+
+        with self.lock:
+            self.projectors[key] = project
+        return project
+
+    def verify_table(self, model):
+        """
+        Check that every column of the model exists in the database table.
+        """
+        table_name = model._meta.table_name
+        db_columns = {column.name for column in self.db.get_columns(table_name)}
+        missing = [
+            field.column_name
+            for field in model._meta.sorted_fields
+            if field.column_name not in db_columns
+        ]
+        if missing:
+            raise SchemaMismatchError(
+                f"Table '{table_name}' is missing columns {missing}. "
+                "Recreate it, or load into a new database.")
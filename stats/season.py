@@ -21,7 +21,8 @@ Season builder.
 
 from models import Season
 
-from db_utils import insert_many_on_conflict_ignore
+from db_utils import create_tables, insert_many_on_conflict_ignore
+from partitions import create_season_partitions
 from utils import season_id_to_int
 from peewee import fn
 
@@ -36,17 +37,21 @@ class SeasonBuilder:
         """
         Creates the season table.
         """
-        self.settings.db.create_tables([Season], safe=True)
+        create_tables(self.settings, [Season])
 
     def populate(self, seasons):
         """
         Populates the season table from the passed seasons. Ignores previous seasons
-        that were already loaded.
+        that were already loaded. Also adds the seasons' partitions to tables
+        partitioned by season.
         """
 
         season_ints = list(map(lambda p: self.season_to_row(p), seasons))
         insert_many_on_conflict_ignore(self.settings, Season, season_ints)
 
+        if self.settings.partition_seasons:
+            create_season_partitions(self.settings, [row['season_id'] for row in season_ints])
+
     def current_season_loaded(self):
         rows = self.settings.db.execute_sql("SELECT MAX(season_id) FROM season;").fetchall()
         season_id = rows[0][0]
@@ -19,9 +19,19 @@ limitations under the License.
 Class for user defined settings.
 """
 
-from peewee import PostgresqlDatabase, MySQLDatabase, SqliteDatabase
+from peewee import SqliteDatabase
+from playhouse.pool import PooledMySQLDatabase, PooledPostgresqlDatabase
+
+from http_client import HttpClient
+from rate_limiter import TokenBucket, AdaptiveRateController
+from response_cache import ResponseCache
+from schema_cache import SchemaCache
+
+import bulk_load
+import duckdb_database
 
 import os
+import sys
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -39,7 +49,15 @@ class Settings:
 
     def __init__(self, database_type, database_name,
                  database_user, database_password, database_host,
-                 batch_size, sqlite_path, quiet):
+                 batch_size, sqlite_path, quiet, http_pool_size=10,
+                 requests_per_second=None, request_burst=1, max_in_flight=4,
+                 adaptive_rate=False, max_requests_per_second=10.0,
+                 request_timeout=30, request_retries=3,
+                 response_cache_dir=None, cache_ttl_hours=24, cache_max_mb=4096,
+                 offline_replay=False, parallel_stages=1, verify_schema=False,
+                 queue_depth=2, sqlite_bulk_load=False, defer_indexes=False, writers=1,
+                 duckdb_path='nba_sql.duckdb', parquet_dir=None, partition_seasons=False,
+                 shard_by=None):
 
         self.user_agent = (
             "Mozilla/5.0 (X11; Linux x86_64) "
@@ -48,6 +66,68 @@ class Settings:
         )
 
         self.db_type = database_type
+        # See sqlite_bulk.py. executemany is only used inside the profile.
+        self.sqlite_bulk_load = sqlite_bulk_load and database_type == 'sqlite'
+        self.sqlite_executemany = False
+        self.sqlite_variable_limit = None
+
+        # See db_utils.create_tables.
+        self.defer_indexes = defer_indexes
+        self.created_models = set()
+
+        # See partitions.py. Postgres only.
+        self.partition_seasons = partition_seasons and database_type == 'postgres'
+        if partition_seasons and not self.partition_seasons and not quiet:
+            print("Partitioning by season is only supported on postgres, ignoring --partition-seasons.")
+
+        # See parquet_export.py, written at the end of a load.
+        if parquet_dir is not None and bulk_load.pyarrow is None:
+            sys.exit("Parquet export needs the pyarrow package: pip install pyarrow")
+        self.parquet_dir = parquet_dir
+
+        # Cleared if the MySQL server turns out to refuse LOAD DATA LOCAL.
+        self.load_data_local = database_type == 'mysql'
+        self.parallel_stages = parallel_stages
+
+        # Global request budget, shared by every requester. A rate of 0 (or
+        # None) turns rate limiting off.
+        self.limiter = None
+        if requests_per_second:
+            self.limiter = TokenBucket(requests_per_second, request_burst)
+        self.max_in_flight = max_in_flight
+        self.queue_depth = queue_depth
+
+        # Month or week, see utils.date_shards. None requests whole seasons.
+        self.shard_by = shard_by
+
+        # In adaptive mode the budget above is only the starting point. It
+        # climbs while responses are healthy and is cut when throttled.
+        self.rate_controller = None
+        if adaptive_rate:
+            if self.limiter is None:
+                self.limiter = TokenBucket(1.0, request_burst)
+            self.rate_controller = AdaptiveRateController(
+                self.limiter,
+                min_rate=min(self.limiter.rate, 0.2),
+                max_rate=max_requests_per_second)
+
+        # Optional on disk cache of responses. Replaying only reads from it.
+        self.response_cache = None
+        if response_cache_dir is not None:
+            self.response_cache = ResponseCache(
+                response_cache_dir,
+                ttl=cache_ttl_hours * 3600,
+                max_bytes=cache_max_mb * 1024 * 1024,
+                offline=offline_replay)
+
+        # Shared by every requester, keeps connections to the NBA API alive.
+        self.http = HttpClient(
+            http_pool_size,
+            self.limiter,
+            self.rate_controller,
+            request_timeout,
+            request_retries,
+            self.response_cache)
 
         name = DB_NAME
         user = DB_USER
@@ -64,26 +144,58 @@ class Settings:
         if database_host is not None:
             host = database_host
 
+        # SQLite only allows one writer at a time. DuckDB allows several, but
+        # appends to the same table contend on its indexes.
+        if database_type in ("sqlite", "duckdb") and writers > 1:
+            if not quiet:
+                print("Only one writer is supported on this database, ignoring --writers.")
+            writers = 1
+        self.writers = writers
+
+        # Every thread that touches the database holds its own connection:
+        # the main thread, the load stages, and the writers of each stage.
+        # Past the limit, threads wait for a connection to be returned.
+        max_connections = max(20, parallel_stages * (writers + 1) + 1)
+
         if database_type == "postgres":
             if not quiet:
                 print("Connecting to postgres database.")
-            self.db = PostgresqlDatabase(
+            self.db = PooledPostgresqlDatabase(
                 name,
                 host=host,
                 user=user,
-                password=password
+                password=password,
+                max_connections=max_connections,
+                stale_timeout=300,
+                timeout=600
             )
         elif database_type == "sqlite":
             if not quiet:
                 print("Initializing sqlite database.")
-            self.db = SqliteDatabase(sqlite_path, pragmas={'journal_mode': 'wal'})
+            # Load stages can run in parallel, so writers may have to wait on
+            # each other for a while.
+            self.db = SqliteDatabase(sqlite_path, pragmas={'journal_mode': 'wal'}, timeout=300)
+        elif database_type == "duckdb":
+            if duckdb_database.duckdb is None or bulk_load.pyarrow is None:
+                sys.exit("DuckDB support needs the duckdb and pyarrow packages: pip install duckdb pyarrow")
+            if not quiet:
+                print("Initializing duckdb database.")
+            self.db = duckdb_database.DuckDBDatabase(duckdb_path)
         else:
             if not quiet:
                 print("Connecting to mysql database.")
-            self.db = MySQLDatabase(
+            self.db = PooledMySQLDatabase(
                 name,
                 host=host,
                 user=user,
                 password=password,
-                charset='utf8mb4'
+                max_connections=max_connections,
+                stale_timeout=300,
+                timeout=600,
+                charset='utf8mb4',
+                # Bulk loads use LOAD DATA LOCAL INFILE, see bulk_load.py.
+                local_infile=True
             )
+
+        # Column lists of every table, built from the models once per run.
+        self.schema = SchemaCache(self.db, verify_schema)
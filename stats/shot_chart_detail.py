@@ -21,9 +21,10 @@ ShotChartDetail builder and requester.
 
 import urllib.parse
 
-from models import ShotChartDetail, ShotChartDetailTemp
+from models import Game, ShotChartDetail, ShotChartDetailTemp
 from general_requester import GenericRequester
-from db_utils import insert_many
+from db_utils import insert_many, add_season_column, merge_staged
+from utils import date_param, generate_valid_season
 
 
 class ShotChartDetailRequester(GenericRequester):
@@ -37,6 +38,15 @@ class ShotChartDetailRequester(GenericRequester):
         super().__init__(settings, self.shot_chart_detail_url, ShotChartDetail)
         # TODO: this conflicts with a fresh db.
         self.settings.db.bind([ShotChartDetailTemp])
+        add_season_column(self.settings, ShotChartDetail)
+        self.create_temp_table()
+
+    def create_temp_table(self):
+        """
+        The temp table only exists on the connection that created it. Call
+        this before loading from a thread other than the one that built the
+        requester.
+        """
         self.settings.db.create_tables([ShotChartDetailTemp], safe=True)
 
     def create_ddl(self):
@@ -45,88 +55,49 @@ class ShotChartDetailRequester(GenericRequester):
         """
         super().create_ddl()
 
-    def temp_table_except_predicate(self):
+    def finalize(self):
         """
-        This runs an EXCEPT between the temp table and the non-temp table to find
-        the new games.
-
-        This is a silly way to do this, but I wanted a quick copy/paste to unblock
-        something else.
+        This function finishes loading shot_chart_detail by inserting the new
+        records from the temp table into the main table. The temp table is
+        dropped at the end of the session.
         """
-        regular_query = ShotChartDetail.select(ShotChartDetail.game_id)
-        temp_query = ShotChartDetailTemp.select(ShotChartDetailTemp.game_id)
+        print('Inserting from shot_chart_detail temp table into main table.')
+        self.insert_from_temp()
+        print('Insert finished.')
 
-        expt = temp_query - regular_query
+    def insert_from_temp(self):
+        """
+        Merges the rows in the temp table into the main table. Shots of games
+        that aren't in the game table, and shots that were already loaded,
+        are skipped. The season comes from the game.
+        """
+        fields = [
+            field for field in ShotChartDetail._meta.sorted_fields
+            if field.name not in ('id', 'season_id')
+        ]
+        query = (ShotChartDetailTemp
+                 .select(*[getattr(ShotChartDetailTemp, field.name) for field in fields], Game.season_id)
+                 .join(Game, on=(ShotChartDetailTemp.game_id == Game.game_id)))
 
-        return expt.select_from(expt.c.game_id)
+        merge_staged(
+            self.settings,
+            ShotChartDetail,
+            query,
+            fields + [ShotChartDetail.season_id],
+            key=['game_id', 'game_event_id', 'player_id'])
 
-    def finalize(self, filter_predicate):
+    def clear_temp(self):
         """
-        This function finishes loading shot_chart_detail by inserting all valid
-        records from the temp table into the main table. The temp table is
-        dropped at the end of the session.
-
-        This accepts a predicate to define what game_ids to filter on.
-        Examples of usage: to only add rows for existing games, or for the
-        EXCEPT for the player_game_log regular and temp tables.
+        Empty the temp table, once its rows are in the main table.
         """
-        print('Inserting from shot_chart_detail temp table into main table.')
-        with self.settings.db.atomic():
-            (ShotChartDetail.insert_from(
-                ShotChartDetailTemp.select(
-                            ShotChartDetailTemp.game_id,
-                            ShotChartDetailTemp.player_id,
-                            ShotChartDetailTemp.team_id,
-                            ShotChartDetailTemp.game_event_id,
-                            ShotChartDetailTemp.period,
-                            ShotChartDetailTemp.minutes_remaining,
-                            ShotChartDetailTemp.seconds_remaining,
-                            ShotChartDetailTemp.event_type,
-                            ShotChartDetailTemp.action_type,
-                            ShotChartDetailTemp.shot_type,
-                            ShotChartDetailTemp.shot_zone_basic,
-                            ShotChartDetailTemp.shot_zone_area,
-                            ShotChartDetailTemp.shot_zone_range,
-                            ShotChartDetailTemp.shot_distance,
-                            ShotChartDetailTemp.loc_x,
-                            ShotChartDetailTemp.loc_y,
-                            ShotChartDetailTemp.shot_attempted_flag,
-                            ShotChartDetailTemp.shot_made_flag,
-                            ShotChartDetailTemp.htm,
-                            ShotChartDetailTemp.vtm
-                ).where(ShotChartDetailTemp.game_id.in_(filter_predicate)),
-                # TODO: Cleaner way to specify all fields but one?
-                fields=[
-                    ShotChartDetail.game_id,
-                    ShotChartDetail.player_id,
-                    ShotChartDetail.team_id,
-                    ShotChartDetail.game_event_id,
-                    ShotChartDetail.period,
-                    ShotChartDetail.minutes_remaining,
-                    ShotChartDetail.seconds_remaining,
-                    ShotChartDetail.event_type,
-                    ShotChartDetail.action_type,
-                    ShotChartDetail.shot_type,
-                    ShotChartDetail.shot_zone_basic,
-                    ShotChartDetail.shot_zone_area,
-                    ShotChartDetail.shot_zone_range,
-                    ShotChartDetail.shot_distance,
-                    ShotChartDetail.loc_x,
-                    ShotChartDetail.loc_y,
-                    ShotChartDetail.shot_attempted_flag,
-                    ShotChartDetail.shot_made_flag,
-                    ShotChartDetail.htm,
-                    ShotChartDetail.vtm
-                ]
-            )).execute()
-
-        print('Insert finished.')
+        ShotChartDetailTemp.delete().execute()
 
-    def generate_rows(self, team_id, player_id):
+    def generate_rows(self, team_id, player_id, season_id, date_from=None):
         """
-        Build GET REST request to the NBA for a season.
+        Build GET REST request to the NBA for a player's shots with a team in
+        a season. With `date_from`, only the games since then are requested.
         """
-        params = self.build_params(team_id, player_id)
+        params = self.build_params(team_id, player_id, season_id, date_from)
 
         # Encode without safe '+', apparently the NBA likes unsafe url params.
         params_str = urllib.parse.urlencode(params, safe=':+')
@@ -137,16 +108,20 @@ class ShotChartDetailRequester(GenericRequester):
         Store collected rows. Custom implementation to clear out the rows beteen
         populations and insert into the staging table.
         """
-        insert_many(self.settings, ShotChartDetailTemp, self.rows)
+        insert_many(self.settings, ShotChartDetailTemp, self.rows, self.insert_fields())
         self.rows = []
 
-    def build_params(self, team_id, player_id):
+    def build_params(self, team_id, player_id, season_id, date_from=None):
         """
-        Create required parameters dict for the request.
+        Create required parameters dict for the request. Without a season the
+        API returns the player's whole career with the team.
         """
         params = self.base_params()
         params['PlayerID'] = player_id
         params['TeamID'] = team_id
+        params['Season'] = generate_valid_season(season_id)
+        if date_from is not None:
+            params['DateFrom'] = date_param(date_from)
         return params
 
     def base_params(self):
@@ -0,0 +1,138 @@
+"""
+------------------------------------------------------------------------------
+Copyright 2023 Matthew Pope
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+------------------------------------------------------------------------------
+
+
+SQLite bulk loading.
+
+Multi-row INSERTs are sized from the real bound variable limit of the SQLite
+library instead of a fixed row count. With `--sqlite-bulk-load`, the load
+runs with pragmas that trade durability for speed, rows are inserted with
+`executemany` on one prepared statement, and safe pragmas are restored at
+the end.
+"""
+
+import sqlite3
+
+from bulk_load import prepare_rows
+
+# Before 3.32.0 SQLite defaulted to 999 bound variables per statement.
+default_variable_limit = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+
+class SqliteBulkLoad:
+    """
+    Context manager that switches the database to the bulk load pragmas.
+    They are applied to every connection opened while it is active, which
+    covers the threads of the stage scheduler and the writer pipeline.
+    """
+
+    # A crash of the process can't corrupt the database in WAL mode, a crash
+    # of the machine can. Rerun the load with --resume in that case.
+    load_pragmas = [
+        ('synchronous', 'off'),
+        ('cache_size', -256 * 1024),
+        ('temp_store', 'memory'),
+        ('mmap_size', 1024 * 1024 * 1024),
+        ('wal_autocheckpoint', 10000),
+    ]
+
+    # SQLite's defaults.
+    safe_pragmas = [
+        ('synchronous', 'full'),
+        ('cache_size', -2000),
+        ('temp_store', 'default'),
+        ('mmap_size', 0),
+        ('wal_autocheckpoint', 1000),
+    ]
+
+    def __init__(self, settings):
+        """
+        Constructor.
+        """
+        self.settings = settings
+
+    def __enter__(self):
+        print("Using the SQLite bulk load profile.")
+        for key, value in self.load_pragmas:
+            self.settings.db.pragma(key, value, permanent=True)
+        self.settings.sqlite_executemany = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.settings.sqlite_executemany = False
+        for key, value in self.safe_pragmas:
+            self.settings.db.pragma(key, value, permanent=True)
+        # Fold the WAL, which grew large with the checkpoints spread out,
+        # back into the database.
+        self.settings.db.execute_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+
+
+def variable_limit(settings):
+    """
+    Maximum number of bound variables in a statement. Read from the
+    connection where Python allows it (3.11+), then from the compile options,
+    then guessed from the library version.
+    """
+    if settings.sqlite_variable_limit is not None:
+        return settings.sqlite_variable_limit
+
+    connection = settings.db.connection()
+    if hasattr(connection, 'getlimit'):
+        limit = connection.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+    else:
+        limit = default_variable_limit
+        for (option,) in settings.db.execute_sql('PRAGMA compile_options').fetchall():
+            if option.startswith('MAX_VARIABLE_NUMBER='):
+                limit = int(option.split('=', 1)[1])
+
+    settings.sqlite_variable_limit = limit
+    return limit
+
+
+def chunk_size(settings, table, rows, fields):
+    """
+    Number of rows that fit in one multi-row INSERT. peewee also binds the
+    model's fields with a default that the rows leave out, so the width of a
+    row is read from the statement it builds for the first one.
+    """
+    _, params = table.insert_many(rows[:1], fields).sql()
+    return max(variable_limit(settings) // max(len(params), 1), 1)
+
+
+def executemany_rows(settings, table, rows, fields=None, ignore=False):
+    """
+    Insert the rows with executemany on a single prepared statement. Rows are
+    either dicts with the same keys, or tuples in the order of `fields`.
+    """
+    if not rows:
+        return
+
+    fields, row_fn = prepare_rows(table, rows, fields)
+    converters = [field.db_value for field in fields]
+    columns = ', '.join(f'"{field.column_name}"' for field in fields)
+    placeholders = ', '.join('?' for _ in fields)
+    verb = 'INSERT OR IGNORE' if ignore else 'INSERT'
+    sql = f'{verb} INTO "{table._meta.table_name}" ({columns}) VALUES ({placeholders})'
+
+    def params():
+        for row in rows:
+            if row_fn is not None:
+                row = row_fn(row)
+            yield tuple(converter(value) for converter, value in zip(converters, row))
+
+    with settings.db.atomic():
+        settings.db.cursor().executemany(sql, params())
@@ -19,7 +19,7 @@ limitations under the License.
 Misc utilities.
 """
 
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 
 def season_id_to_int(season_id):
@@ -29,40 +29,85 @@ def season_id_to_int(season_id):
     return int(season_id[:4])
 
 
-def get_rowset_mapping(result_sets, column_names):
+def game_id_to_season_int(game_id):
     """
-    Returns a list of mapped fields to the passed headers.
+    Util to get the season of a game from its id, as in `season_id_to_int`.
+    Game ids are built as 00 + game type + the season's last two digits +
+    the game number, e.g. 0021900001 is a game of the 2019-20 season.
     """
+    year = int(game_id) // 100000 % 100
+    # The league started in 1946.
+    return 1900 + year if year >= 46 else 2000 + year
 
-    headers = result_sets['headers']
-    mapped = {}
-    for column in column_names:
-        column_upper = column.upper()
-        if column_upper not in headers:
-            mapped[column] = None
-        else:
-            mapped[column] = headers.index(column.upper())
 
-    return mapped
+def date_param(game_date):
+    """
+    Util to format a game date, as returned by the API (2019-10-22T00:00:00)
+    or read from the game table, for the DateFrom / DateTo request params.
+    """
+    year, month, day = str(game_date)[:10].split('-')
+    return f"{month}/{day}/{year}"
 
 
-def column_names_from_table(db, table_name):
+# Seasons that didn't run from October to April, with the playoffs from April
+# to June. First and last day of their regular season, then of their playoffs.
+season_windows = {
+    # Lockout, started in February.
+    1998: ((date(1999, 2, 1), date(1999, 5, 31)), (date(1999, 5, 1), date(1999, 6, 30))),
+    # Lockout, started on Christmas.
+    2011: ((date(2011, 12, 1), date(2012, 4, 30)), (date(2012, 4, 1), date(2012, 6, 30))),
+    # Suspended in March, finished in the bubble.
+    2019: ((date(2019, 10, 1), date(2020, 8, 31)), (date(2020, 8, 1), date(2020, 10, 31))),
+    # Started in December.
+    2020: ((date(2020, 12, 1), date(2021, 5, 31)), (date(2021, 5, 1), date(2021, 7, 31))),
+}
+
+
+def season_window(season, playoff_games):
     """
-    Gets the column names from a db table.
+    Util to get the first and last day, both inclusive, the regular season or
+    playoff games of a season can fall on.
     """
+    regular, playoffs = season_windows.get(season, (
+        (date(season, 10, 1), date(season + 1, 4, 30)),
+        (date(season + 1, 4, 1), date(season + 1, 6, 30)),
+    ))
+    return playoffs if playoff_games else regular
 
-    columns = db.get_columns(table_name)
-    mapped = [column.name for column in columns]
 
-    # season_id is our construct, and isn't returned by any NBA endpoint.
-    if 'season_id' in mapped:
-        mapped.remove('season_id')
+def date_shards(first, last, shard_by):
+    """
+    Util to split the dates from `first` to `last`, both inclusive, into
+    month or week long ranges, for the DateFrom / DateTo request params.
+    Returns (first, last) date tuples, both inclusive. Dates that haven't
+    come yet are left out.
+    """
+    first = date.fromisoformat(str(first)[:10])
+    last = min(date.fromisoformat(str(last)[:10]), date.today() + timedelta(days=1))
+
+    shards = []
+    while first <= last:
+        if shard_by == 'week':
+            next_first = first + timedelta(days=7)
+        else:
+            next_first = (first.replace(day=1) + timedelta(days=32)).replace(day=1)
+        shards.append((first, min(next_first - timedelta(days=1), last)))
+        first = next_first
+    return shards
+
+
+def get_rowset_mapping(result_sets, column_names):
+    """
+    Returns a list of mapped fields to the passed headers.
+    """
 
-    # Ignore autogenerated id columns.
-    if 'id' in mapped:
-        mapped.remove('id')
+    # First index of every header, like headers.index() but without a scan
+    # per column.
+    header_indexes = {}
+    for index, header in enumerate(result_sets['headers']):
+        header_indexes.setdefault(header, index)
 
-    return mapped
+    return {column: header_indexes.get(column.upper()) for column in column_names}
 
 
 def chunk_list(in_list, n):
@@ -72,7 +117,8 @@ def chunk_list(in_list, n):
     return [in_list[i:i + n] for i in range(0, len(in_list), n)]
 
 
-def progress_bar(iterable, prefix='', suffix='', decimals=1, length=100, fill='█', printEnd="\r", quiet=False):
+def progress_bar(iterable, prefix='', suffix='', decimals=1, length=100, fill='█', printEnd="\r", quiet=False,
+                 total=None, status=None):
     """
     https://stackoverflow.com/questions/3173320/text-progress-bar-in-the-console
     Call in a loop to create terminal progress bar
@@ -86,10 +132,14 @@ def progress_bar(iterable, prefix='', suffix='', decimals=1, length=100, fill='
     fill        - Optional  : bar fill character (Str)
     printEnd    - Optional  : end character (e.g. "\r", "\r\n") (Str)
     quiet       - Optoinal  : should do printing. (Bool)
+    total       - Optional  : total iterations, for iterables without a len (Int)
+    status      - Optional  : called on every print, output follows the suffix (Function)
     """
-    total = 1
-    if iterable:
-        total = len(iterable)
+    if total is None:
+        total = 1
+        if iterable:
+            total = len(iterable)
+    total = max(total, 1)
 
     # Progress Bar Printing Function
     def printProgressBar(iteration):
@@ -99,8 +149,9 @@ def progress_bar(iterable, prefix='', suffix='', decimals=1, length=100, fill='
         )
         filledLength = int(length * iteration // total)
         bar = fill * filledLength + '-' * (length - filledLength)
+        status_str = f' [{status()}]' if status else ''
         if not quiet:
-            print(f'\r{prefix} |{bar}| {percent}% {suffix}', end=printEnd)
+            print(f'\r{prefix} |{bar}| {percent}% {suffix}{status_str}', end=printEnd)
     # Initial Call
     printProgressBar(0)
     # Update Progress Bar